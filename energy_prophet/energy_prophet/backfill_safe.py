@@ -3,6 +3,7 @@ import sys
 import datetime
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # --- FIX IMPORTÓW ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -51,24 +52,35 @@ def run_backfill():
 
     current_date = START_DATE
 
-    while current_date <= END_DATE:
-        print(f"\n📅 Processing: {current_date}")
-        try:
-            # 1. PSE (Dane energetyczne)
-            print("   ⚡ Fetching PSE data...")
-            pse.run_etl(current_date)
+    # Pipelining: fetch pogody dla dnia N+1 leci w tle (HTTP), podczas gdy
+    # dzień N jest przetwarzany przez PSE i zapisywany do SQL.
+    with ThreadPoolExecutor(max_workers=1) as prefetch_pool:
+        weather_future = prefetch_pool.submit(weather.prefetch, current_date)
 
-            # 2. POGODA (Dane meteo dla 16 klastrów)
-            print("   ☁️ Fetching Weather data...")
-            weather.run_etl(current_date)
+        while current_date <= END_DATE:
+            print(f"\n📅 Processing: {current_date}")
 
-            # Pauza dla kultury (Open-Meteo prosi o niebombardowanie)
-            time.sleep(5)
+            next_date = current_date + datetime.timedelta(days=1)
+            next_future = (prefetch_pool.submit(weather.prefetch, next_date)
+                           if next_date <= END_DATE else None)
 
-        except Exception as e:
-            print(f"   ⚠️ Error for {current_date}: {e}")
+            try:
+                # 1. PSE (Dane energetyczne)
+                print("   ⚡ Fetching PSE data...")
+                pse.run_etl(current_date)
 
-        current_date += datetime.timedelta(days=1)
+                # 2. POGODA (Dane meteo dla 16 klastrów, prefetched w tle)
+                print("   ☁️ Saving Weather data (prefetched)...")
+                weather.run_etl(current_date, prefetched_df=weather_future.result())
+
+                # Pauza dla kultury (Open-Meteo prosi o niebombardowanie)
+                time.sleep(5)
+
+            except Exception as e:
+                print(f"   ⚠️ Error for {current_date}: {e}")
+
+            weather_future = next_future
+            current_date = next_date
 
     print("\n🏁 FULL BACKFILL COMPLETED SUCCESSFULLY!")
 
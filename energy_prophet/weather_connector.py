@@ -6,12 +6,21 @@ import time
 import datetime
 import os
 import sys
+
+try:
+    import orjson  # szybszy parse dużych odpowiedzi Open-Meteo (C, ~3-5x vs stdlib)
+except ImportError:
+    orjson = None
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from csv_staging_utils import is_csv_only, save_to_staging
 
 
 class WeatherConnector:
+    # DDL "IF NOT EXISTS" jest no-opem po pierwszym uruchomieniu — cache'ujemy
+    # per-proces, żeby nie wysyłać go do SQL Server przy każdym run_etl (backfill!)
+    _table_created = False
+
     def __init__(self, sql_conn_str):
         self.sql_conn_str = sql_conn_str
 
@@ -49,11 +58,21 @@ class WeatherConnector:
         if city in demand_locations: return 'DEMAND'
         return 'MIXED'
 
-    def run_etl(self, target_date):
-        """Pobiera pogodę dla klastrów energetycznych"""
+    def prefetch(self, target_date):
+        """Sam fetch, bez zapisu — do pipeliningu w backfillu (fetch N+1 || save N)."""
+        return self._fetch_weather(target_date)
+
+    def run_etl(self, target_date, prefetched_df=None):
+        """Pobiera pogodę dla klastrów energetycznych.
+
+        prefetched_df: wynik wcześniejszego prefetch() — pomija etap fetch.
+        """
         try:
-            logging.info(f"   Fetching weather data for {len(self.locations)} strategic clusters...")
-            df = self._fetch_weather(target_date)
+            if prefetched_df is not None:
+                df = prefetched_df
+            else:
+                logging.info(f"   Fetching weather data for {len(self.locations)} strategic clusters...")
+                df = self._fetch_weather(target_date)
             if not df.empty:
                 self._save_to_sql(df)
                 logging.info(f"   Weather data saved: {len(df)} rows")
@@ -65,7 +84,7 @@ class WeatherConnector:
 
     def _fetch_weather(self, date):
         """Batch fetch - wszystkie 16 lokalizacji w JEDNYM request do Open-Meteo."""
-        all_data = []
+        frames = []
         date_str = date.strftime('%Y-%m-%d')
 
         # --- LOGIKA: API vs ARCHIVE ---
@@ -95,7 +114,7 @@ class WeatherConnector:
             try:
                 r = requests.get(base_url, params=params, timeout=30)
                 r.raise_for_status()
-                results = r.json()
+                results = orjson.loads(r.content) if orjson else r.json()
 
                 # Odpowiedź to tablica obiektów (jeden per lokalizacja)
                 if not isinstance(results, list):
@@ -106,44 +125,52 @@ class WeatherConnector:
                     coords = self.locations[city]
                     hourly = data.get('hourly', {})
                     times = hourly.get('time', [])
-                    temps = hourly.get('temperature_2m', [])
-                    winds = hourly.get('wind_speed_10m', [])
-                    wind_dirs = hourly.get('wind_direction_10m', [])
-                    solar = hourly.get('direct_radiation', [])
-                    clouds = hourly.get('cloud_cover', [])
-
-                    for i, t_str in enumerate(times):
-                        dt = pd.to_datetime(t_str)
-                        all_data.append({
-                            'location': city,
-                            'location_type': self._get_location_type(city),
-                            'dtime': dt,
-                            'business_date': dt.strftime('%Y-%m-%d'),
-                            'hour': dt.hour,
-                            'lat': coords['lat'],
-                            'lon': coords['lon'],
-                            'temp_c': temps[i] if i < len(temps) else None,
-                            'wind_kph': winds[i] if i < len(winds) else None,
-                            'wind_direction': wind_dirs[i] if i < len(wind_dirs) else None,
-                            'solar_rad': solar[i] if i < len(solar) else None,
-                            'cloud_cover': clouds[i] if i < len(clouds) else None
-                        })
-
-                logging.info(f"   ✓ Batch weather fetch OK: {len(cities)} cities, {len(all_data)} rows")
+                    if not times:
+                        continue
+                    n = len(times)
+
+                    def _col(values):
+                        # Dopasuj długość do osi czasu (braki na końcu -> NaN)
+                        return pd.Series(values[:n], dtype='float64').reindex(range(n))
+
+                    frames.append(pd.DataFrame({
+                        'location': city,
+                        'location_type': self._get_location_type(city),
+                        'dtime': pd.to_datetime(times),
+                        'lat': coords['lat'],
+                        'lon': coords['lon'],
+                        'temp_c': _col(hourly.get('temperature_2m', [])),
+                        'wind_kph': _col(hourly.get('wind_speed_10m', [])),
+                        'wind_direction': _col(hourly.get('wind_direction_10m', [])),
+                        'solar_rad': _col(hourly.get('direct_radiation', [])),
+                        'cloud_cover': _col(hourly.get('cloud_cover', [])),
+                    }))
+
+                total_rows = sum(len(f) for f in frames)
+                logging.info(f"   ✓ Batch weather fetch OK: {len(cities)} cities, {total_rows} rows")
                 break  # Sukces
 
             except Exception as e:
                 if attempt < max_retries - 1:
                     wait_time = (attempt + 1) * 5
+                    # Przy 429 szanuj Retry-After serwera zamiast sztywnego backoffu
+                    resp = getattr(e, 'response', None)
+                    retry_after = resp.headers.get('Retry-After') if resp is not None else None
+                    if retry_after and retry_after.isdigit():
+                        wait_time = int(retry_after)
                     logging.warning(
                         f"   ⚠️ Batch weather fetch failed. Retrying in {wait_time}s... (Attempt {attempt + 1}/{max_retries}): {e}")
                     time.sleep(wait_time)
                 else:
                     logging.error(f"   ❌ Batch weather fetch failed after {max_retries} attempts: {e}")
 
-        if not all_data:
+        if not frames:
             return pd.DataFrame()
-        return pd.DataFrame(all_data)
+        df = pd.concat(frames, ignore_index=True)
+        # Wektorowo (raz na całą ramkę, w C) zamiast strftime/.hour per wiersz
+        df['business_date'] = df['dtime'].dt.date
+        df['hour'] = df['dtime'].dt.hour.astype('int8')
+        return df
 
     def _connect_with_retry(self, max_retries=5):
         """Połączenie SQL z retry logic."""
@@ -190,21 +217,56 @@ class WeatherConnector:
         );
         """
 
+        # Staging #temp + fast_executemany (array binding w ODBC), potem jeden
+        # set-based MERGE: cały dzień danych (24h x 16 miast) idzie w dwóch
+        # round-tripach zamiast 384 execute. Bez TVP — pyodbc nie potrafi
+        # rozwiązać typu tabelarycznego w ad-hoc SQL (SQLDescribeParam działa
+        # tylko dla wywołań procedur), a CREATE TYPE wymagałby extra uprawnień.
         merge_sql = """
         MERGE INTO weather_data AS T
-        USING (SELECT ? as loc, ? as loc_type, ? as dt, ? as biz_date, ? as hr,
-                      ? as lat, ? as lon, ? as tmp, ? as wnd, ? as wnd_dir, ? as sol, ? as cld) AS S
-        ON T.location = S.loc AND T.dtime = S.dt
-        WHEN MATCHED THEN UPDATE SET
-            location_type = S.loc_type, business_date = S.biz_date, hour = S.hr,
-            lat = S.lat, lon = S.lon, temp_c = S.tmp, wind_kph = S.wnd,
-            wind_direction = S.wnd_dir, solar_rad = S.sol, cloud_cover = S.cld,
-            created_at = GETDATE()
+        USING #weather_stage AS S
+        ON T.location = S.location AND T.dtime = S.dtime
+        WHEN MATCHED AND (
+               ISNULL(T.temp_c, -999) <> ISNULL(S.temp_c, -999)
+            OR ISNULL(T.wind_kph, -999) <> ISNULL(S.wind_kph, -999)
+            OR ISNULL(T.wind_direction, -999) <> ISNULL(S.wind_direction, -999)
+            OR ISNULL(T.solar_rad, -999) <> ISNULL(S.solar_rad, -999)
+            OR ISNULL(T.cloud_cover, 255) <> ISNULL(S.cloud_cover, 255)
+        ) THEN UPDATE SET
+            location_type = S.location_type, business_date = S.business_date,
+            hour = S.hour, lat = S.lat, lon = S.lon, temp_c = S.temp_c,
+            wind_kph = S.wind_kph, wind_direction = S.wind_direction,
+            solar_rad = S.solar_rad, cloud_cover = S.cloud_cover
         WHEN NOT MATCHED THEN INSERT
             (location, location_type, dtime, business_date, hour, lat, lon,
              temp_c, wind_kph, wind_direction, solar_rad, cloud_cover)
-            VALUES (S.loc, S.loc_type, S.dt, S.biz_date, S.hr, S.lat, S.lon,
-                    S.tmp, S.wnd, S.wnd_dir, S.sol, S.cld);
+            VALUES (S.location, S.location_type, S.dtime, S.business_date, S.hour,
+                    S.lat, S.lon, S.temp_c, S.wind_kph, S.wind_direction,
+                    S.solar_rad, S.cloud_cover);
+        """
+
+        create_stage_sql = """
+        CREATE TABLE #weather_stage (
+            location        VARCHAR(50),
+            location_type   VARCHAR(10),
+            dtime           DATETIME,
+            business_date   DATE,
+            hour            TINYINT,
+            lat             DECIMAL(6,4),
+            lon             DECIMAL(6,4),
+            temp_c          DECIMAL(5,2),
+            wind_kph        DECIMAL(5,2),
+            wind_direction  SMALLINT,
+            solar_rad       DECIMAL(8,2),
+            cloud_cover     TINYINT
+        );
+        """
+
+        insert_stage_sql = """
+        INSERT INTO #weather_stage
+            (location, location_type, dtime, business_date, hour, lat, lon,
+             temp_c, wind_kph, wind_direction, solar_rad, cloud_cover)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
 
         # Retry na cały blok SQL (connect + execute + commit)
@@ -213,28 +275,41 @@ class WeatherConnector:
             try:
                 with self._connect_with_retry() as conn:
                     cursor = conn.cursor()
-                    cursor.execute(create_table_sql)
-                    conn.commit()
+                    if not WeatherConnector._table_created:
+                        cursor.execute(create_table_sql)
+                        conn.commit()
+                        WeatherConnector._table_created = True
+
+                    cols = ['location', 'location_type', 'dtime', 'business_date',
+                            'hour', 'lat', 'lon', 'temp_c', 'wind_kph',
+                            'wind_direction', 'solar_rad', 'cloud_cover']
+                    out = df[cols]
+                    # NaN/NaT -> None w jednym wektorowym przejściu; tolist()
+                    # materializuje natywne typy Pythona w C (pyodbc nie binduje
+                    # skalarów NumPy). Zastępuje iterrows + per-komórkowe pd.isna.
+                    rows = out.astype(object).where(out.notna(), None).to_numpy().tolist()
 
-                    for _, r in df.iterrows():
-                        dtime_val = r['dtime'].to_pydatetime()
-                        vals = [
-                            r['location'],
-                            r['location_type'],
-                            dtime_val,
-                            r['business_date'],
-                            r['hour'],
-                            r['lat'],
-                            r['lon'],
-                            r['temp_c'],
-                            r['wind_kph'],
-                            r['wind_direction'],
-                            r['solar_rad'],
-                            r['cloud_cover']
-                        ]
-                        vals = [None if pd.isna(v) else v for v in vals]
-
-                        cursor.execute(merge_sql, *vals)
+                    cursor.execute(create_stage_sql)
+                    cursor.fast_executemany = True
+                    # Stałe typy parametrów (zgodne z #weather_stage) — ODBC
+                    # binduje bufory raz, bez re-inferencji typów per batch
+                    cursor.setinputsizes([
+                        (pyodbc.SQL_VARCHAR, 50, 0),        # location
+                        (pyodbc.SQL_VARCHAR, 10, 0),        # location_type
+                        (pyodbc.SQL_TYPE_TIMESTAMP, 0, 0),  # dtime
+                        (pyodbc.SQL_TYPE_DATE, 0, 0),       # business_date
+                        (pyodbc.SQL_TINYINT, 0, 0),         # hour
+                        (pyodbc.SQL_DECIMAL, 6, 4),         # lat
+                        (pyodbc.SQL_DECIMAL, 6, 4),         # lon
+                        (pyodbc.SQL_DECIMAL, 5, 2),         # temp_c
+                        (pyodbc.SQL_DECIMAL, 5, 2),         # wind_kph
+                        (pyodbc.SQL_SMALLINT, 0, 0),        # wind_direction
+                        (pyodbc.SQL_DECIMAL, 8, 2),         # solar_rad
+                        (pyodbc.SQL_TINYINT, 0, 0),         # cloud_cover
+                    ])
+                    cursor.executemany(insert_stage_sql, rows)
+                    cursor.execute(merge_sql)
+                    cursor.execute("DROP TABLE #weather_stage;")
                     conn.commit()
                     break  # sukces
 
@@ -15,6 +15,9 @@ Wymaga: requests (pip install requests)
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import asyncio
 import json
 import csv
 import re
@@ -23,11 +26,31 @@ import time
 import random
 import sys
 import io
+import logging
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime, timezone
 from typing import Optional
 
+try:
+    import httpx  # HTTP/2: jeden socket multipleksuje wszystkie GET-y FAZY 2
+    import h2  # noqa: F401 - AsyncClient(http2=True) wymaga extra httpx[http2]
+except ImportError:
+    # httpx bez h2 rzucilby ImportError dopiero przy konstrukcji klienta -
+    # traktuj jak brak httpx, drabinka schodzi na aiohttp/watki
+    httpx = None
+
+try:
+    import aiohttp  # rownolegla FAZA 2; fallback: sekwencyjnie przez requests
+except ImportError:
+    aiohttp = None
+
+try:
+    import orjson  # ~10x szybszy dump/load duzych JSON-ow; fallback: stdlib json
+except ImportError:
+    orjson = None
+
 
 # --- Ladowanie .env (lokalny fallback) ---
 _SCRAPER_DIR_PATH = Path(__file__).parent
@@ -38,16 +61,31 @@ sys.path.insert(0, str(_PROJECT_DIR))
 from csv_staging_utils import is_csv_only, save_to_staging
 
 
+logger = logging.getLogger("jj")
+
+_env_loaded_mtime = None
+
+
 def _load_env():
-    """Laduje zmienne z .env jesli plik istnieje. Niezalezne od pracuj_scraper."""
-    if not _ENV_FILE.exists():
+    """Laduje zmienne z .env jesli plik istnieje. Niezalezne od pracuj_scraper.
+
+    Jeden stat() zamiast exists()+read; cache po st_mtime, wiec ponowne
+    wywolanie nie czyta pliku, jesli sie nie zmienil.
+    """
+    global _env_loaded_mtime
+    try:
+        mtime = _ENV_FILE.stat().st_mtime
+    except OSError:
         return
-    for line in _ENV_FILE.read_text(encoding="utf-8").splitlines():
+    if mtime == _env_loaded_mtime:
+        return
+    _env_loaded_mtime = mtime
+    for line in _ENV_FILE.read_text(encoding="utf-8").split("\n"):
         line = line.strip()
         if not line or line.startswith("#"):
             continue
-        if "=" in line:
-            key, _, value = line.partition("=")
+        key, sep, value = line.partition("=")
+        if sep:
             os.environ.setdefault(key.strip(), value.strip())
 
 
@@ -79,11 +117,60 @@ CATEGORIES = ["data", "analytics", "pm", "ai"]
 # API zwraca max 100 per request
 LISTING_PAGE_SIZE = 100
 
+# body_html to najwiekszy field oferty (20-100KB). Domyslnie zdejmujemy tagi
+# i zapisujemy plain text (mniej bajtow w CSV/JSON i na drucie do Azure SQL).
+# JJ_STRIP_HTML=0 przywraca surowy HTML.
+STRIP_HTML = os.environ.get("JJ_STRIP_HTML", "1") == "1"
+BODY_TEXT_MAX_LEN = 8000
+
+# Twardy limit rozmiaru odpowiedzi detail API — patologiczne oferty z setkami
+# KB markupu nie rozdmuchuja pamieci ani transferu; normalne oferty bez zmian.
+MAX_OFFER_BYTES = 512_000
+
 _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_FILE = os.path.join(_SCRIPT_DIR, "justjoin_premium_selection.json")
 CSV_FILE = os.path.join(_SCRIPT_DIR, "justjoin_premium_selection.csv")
 KNOWN_OFFERS_FILE = os.path.join(_SCRIPT_DIR, "justjoin_known_offers.json")
 
+# Cache surowych odpowiedzi detail API — ponowny run w ciagu TTL nie robi
+# HTTP w ogole. Uzupelnia KNOWN_OFFERS_FILE (ktory tylko dedupuje, bez tresci).
+CACHE_DIR = Path(_SCRIPT_DIR) / "cache"
+CACHE_TTL_SEC = 6 * 3600
+
+
+def _json_loads(data: bytes):
+    """Dekoduje body odpowiedzi orjsonem (C, 3-6x szybciej); fallback: stdlib."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _cache_path(slug: str) -> Path:
+    return CACHE_DIR / slug[:2] / f"{slug}.json"
+
+
+def _cache_get(slug: str) -> Optional[dict]:
+    """Zwraca zcachowana odpowiedz API dla sluga, jesli swieza (TTL)."""
+    p = _cache_path(slug)
+    try:
+        if time.time() - p.stat().st_mtime >= CACHE_TTL_SEC:
+            return None
+        raw = p.read_bytes()
+        return orjson.loads(raw) if orjson is not None else json.loads(raw)
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_put(slug: str, raw: dict):
+    """Zapisuje surowa odpowiedz API do cache (best-effort)."""
+    p = _cache_path(slug)
+    try:
+        p.parent.mkdir(parents=True, exist_ok=True)
+        if orjson is not None:
+            p.write_bytes(orjson.dumps(raw))
+        else:
+            p.write_text(json.dumps(raw, ensure_ascii=False), encoding="utf-8")
+    except OSError:
+        pass
+
 
 # --- Known offers cache (incremental scraping) ---
 
@@ -92,21 +179,31 @@ def load_known_offers() -> dict:
     if not os.path.exists(KNOWN_OFFERS_FILE):
         return {}
     try:
-        with open(KNOWN_OFFERS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        raw = Path(KNOWN_OFFERS_FILE).read_bytes()
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw)
         return data.get("offers", {})
-    except (json.JSONDecodeError, OSError):
+    except (ValueError, OSError):
         return {}
 
 
 def save_known_offers(known: dict):
-    """Zapisuje znane offer_id do pliku cache."""
+    """Zapisuje znane offer_id do pliku cache.
+
+    Zapis przez plik tymczasowy + os.replace (atomowy na POSIX i Windows) —
+    crash w polowie zapisu nie niszczy cache i nie wymusza pelnego re-scrape.
+    """
     data = {
         "last_updated": datetime.now().isoformat(),
         "offers": known,
     }
-    with open(KNOWN_OFFERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    tmp = KNOWN_OFFERS_FILE + ".tmp"
+    if orjson is not None:
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, KNOWN_OFFERS_FILE)
 
 
 # --- Azure SQL Constants ---
@@ -201,6 +298,63 @@ WHEN NOT MATCHED THEN INSERT
             GETDATE());
 """
 
+STAGE_CREATE_SQL = """
+CREATE TABLE #stg_offers (
+    offer_id            NVARCHAR(200),
+    slug                NVARCHAR(500),
+    title               NVARCHAR(500),
+    company             NVARCHAR(500),
+    company_size        NVARCHAR(100),
+    city                NVARCHAR(200),
+    workplace_type      NVARCHAR(100),
+    working_time        NVARCHAR(100),
+    experience_level    NVARCHAR(100),
+    search_category     NVARCHAR(50),
+    published_at        NVARCHAR(50),
+    b2b_from            NVARCHAR(50),
+    b2b_to              NVARCHAR(50),
+    b2b_currency        NVARCHAR(10),
+    b2b_unit            NVARCHAR(20),
+    b2b_gross           NVARCHAR(10),
+    perm_from           NVARCHAR(50),
+    perm_to             NVARCHAR(50),
+    perm_currency       NVARCHAR(10),
+    perm_unit           NVARCHAR(20),
+    perm_gross          NVARCHAR(10),
+    other_type          NVARCHAR(100),
+    other_from          NVARCHAR(50),
+    other_to            NVARCHAR(50),
+    other_currency      NVARCHAR(10),
+    other_unit          NVARCHAR(20),
+    required_skills     NVARCHAR(MAX),
+    nice_to_have_skills NVARCHAR(MAX),
+    url                 NVARCHAR(1000),
+    body_html           NVARCHAR(MAX),
+    scraped_at          NVARCHAR(50)
+);
+"""
+
+STAGE_INSERT_SQL = "INSERT INTO #stg_offers VALUES (" + ", ".join(["?"] * 31) + ")"
+
+# Rozmiary NVARCHAR kolumn #stg_offers w kolejnosci insertu (0 = MAX).
+# Potrzebne do setinputsizes: sp_describe_undeclared_parameters nie widzi
+# #temp tabel, wiec driver nie umie sam wywnioskowac typow parametrow.
+_STAGE_PARAM_SIZES = [
+    200, 500, 500, 500, 100, 200, 100, 100, 100, 50, 50,  # dane oferty
+    50, 50, 10, 20, 10,      # b2b
+    50, 50, 10, 20, 10,      # permanent
+    100, 50, 50, 10, 20,     # other
+    0, 0,                    # skills (MAX)
+    1000, 0, 50,             # url, body_html (MAX), scraped_at
+]
+
+# Ten sam MERGE, ale zrodlem jest staging table zamiast 31 parametrow per wiersz
+STAGE_MERGE_SQL = (
+    MERGE_SQL[:MERGE_SQL.index("USING")]
+    + "USING #stg_offers AS S\n"
+    + MERGE_SQL[MERGE_SQL.index("ON T.url = S.url"):]
+)
+
 ALTER_TABLE_SQL = """
 IF NOT EXISTS (
     SELECT 1 FROM sys.columns
@@ -210,22 +364,70 @@ IF NOT EXISTS (
 ALTER TABLE justjoin_offers ADD first_seen_at DATETIME DEFAULT GETDATE();
 """
 
+# DDL (CREATE/ALTER IF NOT EXISTS) wystarczy wykonac raz na proces —
+# kazde kolejne wywolanie to zbedny round-trip i lock na sys.tables
+_SCHEMA_READY = False
+
 
 # --- Utility ---
 
-def polite_delay(min_s: float = 1.0, max_s: float = 3.0):
-    """Losowe opoznienie aby nie obciazyc serwera."""
-    time.sleep(random.uniform(min_s, max_s))
+# Tryby rate-limitingu: zakres sekund miedzy requestami listingu.
+# "normal" = dotychczasowe zachowanie; "aggressive" polega na backoffie 429.
+RATE_MODES = {
+    "fast": (0.5, 1.0),
+    "aggressive": (0.1, 0.3),
+    "normal": (1.0, 3.0),
+    "conservative": (3.0, 5.0),
+}
+_rate_mode = "normal"
+
+
+def set_rate_mode(mode: str):
+    """Ustawia globalny tryb rate-limitingu (klucz z RATE_MODES)."""
+    global _rate_mode
+    if mode not in RATE_MODES:
+        raise ValueError(f"Nieznany rate_limit_mode: {mode!r} (dozwolone: {sorted(RATE_MODES)})")
+    _rate_mode = mode
+
+
+def polite_delay(scale: float = 1.0):
+    """Losowe opoznienie wg aktywnego trybu; scale skraca/wydluza zakres."""
+    lo, hi = RATE_MODES[_rate_mode]
+    time.sleep(random.uniform(lo * scale, hi * scale))
+
+
+_SESSION: Optional[requests.Session] = None
 
 
 def init_session() -> requests.Session:
     """
     Tworzy sesje HTTP i odwiedza strone glowna aby uzyskac ciasteczka sesji.
     API wymaga waznego unleashSessionId cookie.
+    Singleton per proces — kolejne wywolania zwracaja te sama sesje
+    (pula keep-alive i cookies przezywaja miedzy runami w tym samym procesie).
     """
+    global _SESSION
+    if _SESSION is not None:
+        return _SESSION
     session = requests.Session()
     session.headers.update(HEADERS_PAGE)
+    # Pooling + retry: bez tego domyslny HTTPAdapter (pool_maxsize=10) wypycha
+    # polaczenia i kazdy request placi ~300ms za nowy TLS handshake.
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=64,
+        max_retries=Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods={"GET"},
+            respect_retry_after_header=True,
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
     session.get(BASE_URL, timeout=15)
+    _SESSION = session
     return session
 
 
@@ -246,17 +448,31 @@ def collect_slugs_for_category(
     seen_ids: set[str] = set()
     total = 0
     offset = 0
+    attempt_429 = 0
 
     while True:
         url = f"{API_BASE}?categories={category}&from={offset}&itemsCount={LISTING_PAGE_SIZE}"
 
         try:
             resp = session.get(url, headers=HEADERS_API, timeout=15)
+            if resp.status_code == 429:
+                # Throttling: exponential backoff (cap 30s), Retry-After ma priorytet
+                attempt_429 += 1
+                if attempt_429 > 3:
+                    logger.warning(f"  [BLAD] HTTP 429 na offset={offset} — poddaje sie po 3 probach")
+                    break
+                retry_after = resp.headers.get("Retry-After", "")
+                wait = int(retry_after) if retry_after.isdigit() else 2 ** attempt_429
+                wait = min(wait, 30)
+                logger.debug(f"  [429] throttling, czekam {wait}s (proba {attempt_429}/3)")
+                time.sleep(wait)
+                continue
             if resp.status_code != 200:
-                print(f"  [BLAD] HTTP {resp.status_code} na offset={offset}")
+                logger.warning(f"  [BLAD] HTTP {resp.status_code} na offset={offset}")
                 break
+            attempt_429 = 0
 
-            payload = resp.json()
+            payload = _json_loads(resp.content)
             items = payload.get("data", [])
             total = payload.get("meta", {}).get("totalItems", 0)
 
@@ -277,34 +493,115 @@ def collect_slugs_for_category(
             if page_new == 0 or offset >= total:
                 break
 
-            polite_delay(0.5, 1.5)
+            polite_delay(0.5)
 
         except Exception as e:
-            print(f"  [BLAD] {e}")
+            logger.warning(f"  [BLAD] {e}")
             break
 
     return results, total
 
 
+async def _collect_slugs_async(session, category: str) -> tuple[list[dict], int]:
+    """Asynchroniczna wersja collect_slugs_for_category — jedna kategoria."""
+    results: list[dict] = []
+    seen_ids: set[str] = set()
+    total = 0
+    offset = 0
+    attempt_429 = 0
+
+    while True:
+        url = f"{API_BASE}?categories={category}&from={offset}&itemsCount={LISTING_PAGE_SIZE}"
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as resp:
+                if resp.status == 429:
+                    attempt_429 += 1
+                    if attempt_429 > 3:
+                        logger.warning(f"  [BLAD] HTTP 429 na offset={offset} — poddaje sie po 3 probach")
+                        break
+                    retry_after = resp.headers.get("Retry-After", "")
+                    wait = int(retry_after) if retry_after.isdigit() else 2 ** attempt_429
+                    await asyncio.sleep(min(wait, 30))
+                    continue
+                if resp.status != 200:
+                    logger.warning(f"  [BLAD] HTTP {resp.status} na offset={offset}")
+                    break
+                attempt_429 = 0
+                payload = _json_loads(await resp.read())
+        except Exception as e:
+            logger.warning(f"  [BLAD] {e}")
+            break
+
+        items = payload.get("data", [])
+        total = payload.get("meta", {}).get("totalItems", 0)
+        if not items:
+            break
+
+        page_new = 0
+        for item in items:
+            slug = item.get("slug", "")
+            offer_id = item.get("guid", "")
+            if slug and offer_id and offer_id not in seen_ids:
+                seen_ids.add(offer_id)
+                results.append({"slug": slug, "offer_id": offer_id})
+                page_new += 1
+
+        offset += LISTING_PAGE_SIZE
+        if page_new == 0 or offset >= total:
+            break
+        await asyncio.sleep(random.uniform(0.3, 0.8))
+
+    return results, total
+
+
+async def _collect_all_async(cookies: dict) -> list[tuple[list[dict], int]]:
+    """
+    FAZA 1 rownolegle: wszystkie kategorie naraz (po jednym tasku na kategorie).
+    Wall time ~ max(czas kategorii) zamiast sumy. Zwraca wyniki w kolejnosci
+    CATEGORIES.
+    """
+    connector = aiohttp.TCPConnector(limit=64, limit_per_host=32, keepalive_timeout=30)
+    async with aiohttp.ClientSession(connector=connector, headers=HEADERS_API,
+                                     cookies=cookies) as http:
+        return await asyncio.gather(
+            *[_collect_slugs_async(http, cat) for cat in CATEGORIES]
+        )
+
+
 # --- FAZA 2: Pobieranie szczegulow oferty (REST API) ---
 
 def fetch_offer_details(
     session: requests.Session,
     slug: str,
+    use_cache: bool = True,
 ) -> Optional[dict]:
     """
     Pobiera szczegoly oferty:
     GET /api/candidate-api/offers/{slug}
 
     Filtruje: tylko oferty z countryCode == 'PL'.
+    use_cache=False (tryb --full) wymusza refetch; zapis do cache zostaje.
     """
-    url = f"{API_BASE}/{slug}"
-    try:
-        resp = session.get(url, headers=HEADERS_API, timeout=15)
-        if resp.status_code != 200:
+    raw = _cache_get(slug) if use_cache else None
+    if raw is None:
+        url = f"{API_BASE}/{slug}"
+        try:
+            # close() na kazdej sciezce wyjscia - niedoczytany stream nie
+            # wraca do puli polaczen i wisialby do GC
+            with session.get(url, headers=HEADERS_API, timeout=15,
+                             stream=True) as resp:
+                if resp.status_code != 200:
+                    return None
+                data = resp.raw.read(MAX_OFFER_BYTES + 1, decode_content=True)
+                if len(data) > MAX_OFFER_BYTES:
+                    return None
+                raw = _json_loads(data)
+        except Exception:
             return None
+        if isinstance(raw, dict):
+            _cache_put(slug, raw)
 
-        raw = resp.json()
+    try:
         if not isinstance(raw, dict) or "title" not in raw:
             return None
 
@@ -318,9 +615,160 @@ def fetch_offer_details(
         return None
 
 
+# --- FAZA 2 async: aiohttp + semafor (bounded concurrency) ---
+
+DETAIL_CONCURRENCY = 32
+
+
+async def _fetch_offer_details_async(session, slug: str, sem,
+                                     use_cache: bool = True) -> Optional[dict]:
+    """Asynchroniczna wersja fetch_offer_details — jeden slug, filtr PL."""
+    raw = _cache_get(slug) if use_cache else None
+    if raw is None:
+        url = f"{API_BASE}/{slug}"
+        async with sem:
+            try:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as resp:
+                    if resp.status != 200:
+                        return None
+                    data = await resp.content.read(MAX_OFFER_BYTES + 1)
+                    if len(data) > MAX_OFFER_BYTES:
+                        return None
+                    raw = _json_loads(data)
+            except Exception:
+                return None
+            # Lekki jitter per task — przepustowosc ksztaltuje semafor, nie sleep
+            await asyncio.sleep(random.uniform(0.1, 0.3))
+        if isinstance(raw, dict):
+            _cache_put(slug, raw)
+
+    if not isinstance(raw, dict) or "title" not in raw:
+        return None
+    if raw.get("countryCode", "").upper() != "PL":
+        return None
+    return _parse_api_offer(raw, slug)
+
+
+async def _gather_details_async(items: list[dict], cookies: dict,
+                                progress_cb=None,
+                                use_cache: bool = True) -> list[Optional[dict]]:
+    """
+    Pobiera detale wszystkich slugow rownolegle (max DETAIL_CONCURRENCY naraz).
+    Zwraca liste wynikow w kolejnosci items (None = skip/blad).
+    cookies: z sesji requests — API wymaga waznego unleashSessionId.
+    """
+    sem = asyncio.Semaphore(DETAIL_CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit=64, limit_per_host=32, keepalive_timeout=30)
+    done = 0
+
+    async def _one(item):
+        nonlocal done
+        offer = await _fetch_offer_details_async(http, item["slug"], sem,
+                                                 use_cache=use_cache)
+        done += 1
+        if progress_cb:
+            progress_cb(done)
+        return offer
+
+    async with aiohttp.ClientSession(connector=connector, headers=HEADERS_API,
+                                     cookies=cookies) as http:
+        return await asyncio.gather(*[_one(it) for it in items])
+
+
+async def _gather_details_httpx(items: list[dict], cookies: dict,
+                                progress_cb=None,
+                                use_cache: bool = True) -> list[Optional[dict]]:
+    """
+    Wariant HTTP/2 (httpx): jeden socket multipleksuje wszystkie GET-y,
+    wiec nie placimy TCP+TLS per rownolegly stream jak w aiohttp/requests.
+    Ten sam kontrakt co _gather_details_async.
+    """
+    sem = asyncio.Semaphore(DETAIL_CONCURRENCY)
+    done = 0
+
+    async def _one(item):
+        nonlocal done
+        slug = item["slug"]
+        raw = _cache_get(slug) if use_cache else None
+        if raw is None:
+            async with sem:
+                try:
+                    r = await client.get(f"{API_BASE}/{slug}")
+                    if r.status_code == 200 and len(r.content) <= MAX_OFFER_BYTES:
+                        raw = _json_loads(r.content)
+                    else:
+                        raw = None
+                except Exception:
+                    raw = None
+                await asyncio.sleep(random.uniform(0.1, 0.3))
+            if isinstance(raw, dict):
+                _cache_put(slug, raw)
+        done += 1
+        if progress_cb:
+            progress_cb(done)
+        if not isinstance(raw, dict) or "title" not in raw:
+            return None
+        if raw.get("countryCode", "").upper() != "PL":
+            return None
+        return _parse_api_offer(raw, slug)
+
+    limits = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+    async with httpx.AsyncClient(http2=True, headers=HEADERS_API, cookies=cookies,
+                                 timeout=15.0, limits=limits) as client:
+        return await asyncio.gather(*[_one(it) for it in items])
+
+
+DETAIL_THREADS = 20
+
+
+def _fetch_details_threaded(session, items: list[dict],
+                            progress_cb=None,
+                            use_cache: bool = True) -> list[Optional[dict]]:
+    """
+    Requests-only odpowiednik _gather_details_async: ThreadPoolExecutor(20)
+    na wspolnej sesji z pooled adapterem. Zwraca liste wynikow w kolejnosci
+    items (None = skip/blad).
+    """
+    results: list[Optional[dict]] = [None] * len(items)
+    done = 0
+
+    def _one(idx: int, item: dict):
+        offer = fetch_offer_details(session, item["slug"], use_cache=use_cache)
+        # Jitter per task — przepustowosc ksztaltuje rozmiar puli, nie sleep
+        time.sleep(random.uniform(0.1, 0.3))
+        return idx, offer
+
+    with ThreadPoolExecutor(max_workers=DETAIL_THREADS) as ex:
+        futures = [ex.submit(_one, i, it) for i, it in enumerate(items)]
+        for fut in as_completed(futures):
+            idx, offer = fut.result()
+            results[idx] = offer
+            done += 1
+            if progress_cb:
+                progress_cb(done)
+    return results
+
+
+_HTML_RE = re.compile(r'<[^>]+>')
+
+
 def _clean_text(text: str) -> str:
-    """Normalizuje whitespace: tabulatory, wielokrotne spacje -> pojedyncza spacja."""
-    return re.sub(r'\s+', ' ', text).strip()
+    """Normalizuje whitespace: tabulatory, wielokrotne spacje -> pojedyncza spacja.
+
+    str.split/join jest szybsze niz re.sub dla krotkich stringow (tytuly < 200 znakow).
+    """
+    return " ".join(text.split()) if text else ""
+
+
+def _body_text(body: str) -> str:
+    """Zdejmuje tagi HTML z body oferty i tnie do BODY_TEXT_MAX_LEN.
+
+    Przy STRIP_HTML=False zwraca surowy HTML bez zmian (kolumna body_html
+    w SQL trzyma wtedy oryginalny markup).
+    """
+    if not (STRIP_HTML and body):
+        return body
+    return " ".join(_HTML_RE.sub(" ", body).split())[:BODY_TEXT_MAX_LEN]
 
 
 def _parse_api_offer(raw: dict, slug: str) -> dict:
@@ -348,22 +796,15 @@ def _parse_api_offer(raw: dict, slug: str) -> dict:
             "gross":               emp.get("gross", False),
         })
 
-    # --- Skills z poziomami ---
-    required_skills = []
-    for s in raw.get("requiredSkills") or []:
-        if isinstance(s, dict):
-            required_skills.append({
-                "name":  s.get("name", ""),
-                "level": s.get("level", 0),
-            })
-
-    nice_to_have_skills = []
-    for s in raw.get("niceToHaveSkills") or []:
-        if isinstance(s, dict):
-            nice_to_have_skills.append({
-                "name":  s.get("name", ""),
-                "level": s.get("level", 0),
-            })
+    # --- Skills z poziomami (API zawsze zwraca listy dictow) ---
+    required_skills = [
+        {"name": s.get("name", ""), "level": s.get("level", 0)}
+        for s in raw.get("requiredSkills") or ()
+    ]
+    nice_to_have_skills = [
+        {"name": s.get("name", ""), "level": s.get("level", 0)}
+        for s in raw.get("niceToHaveSkills") or ()
+    ]
 
     return {
         "offer_id":            raw.get("id", ""),
@@ -382,7 +823,7 @@ def _parse_api_offer(raw: dict, slug: str) -> dict:
         "published_at":        raw.get("publishedAt", ""),
         "expired_at":          raw.get("expiredAt", ""),
         "locations":           raw.get("locations") or [],
-        "body_html":           raw.get("body", ""),
+        "body_html":           _body_text(raw.get("body", "")),
         "url":                 f"{BASE_URL}/job-offer/{slug}",
     }
 
@@ -426,8 +867,8 @@ def display_sample_offer(offer: dict):
         for sk in offer["nice_to_have_skills"][:5]:
             print(f"    - {sk['name']:25s} ({sk['level']}/5)")
 
-    body_text = re.sub(r'<[^>]+>', ' ', offer.get("body_html", ""))
-    body_text = re.sub(r'\s+', ' ', body_text).strip()
+    body_text = _HTML_RE.sub(' ', offer.get("body_html", ""))
+    body_text = " ".join(body_text.split())
     if body_text:
         print(f"\n  Body preview:  {body_text[:200]}...")
 
@@ -436,18 +877,86 @@ def display_sample_offer(offer: dict):
 
 # --- CSV Export ---
 
-def _salary_for_type(salaries: list[dict], emp_type: str) -> dict:
-    """Zwraca dane salary dla danego typu umowy (original currency preferred)."""
-    candidates = [s for s in salaries if s.get("type") == emp_type]
-    # Preferuj oryginalna walute
-    original = [s for s in candidates if s.get("currency_source") == "original"]
-    return (original or candidates or [{}])[0]
+def _split_salaries(salaries: list[dict]) -> tuple[dict, dict, dict]:
+    """
+    Jedno przejscie po salaries: zwraca (b2b, perm, other).
+    Dla b2b/permanent preferowana oryginalna waluta (pierwszy "original" wygrywa);
+    other = pierwszy typ spoza b2b/permanent/unknown.
+    Zastepuje trzy osobne skany listy per oferta (CSV + SQL).
+    """
+    b2b: dict = {}
+    perm: dict = {}
+    other: dict = {}
+    for s in salaries:
+        t = s.get("type")
+        original = s.get("currency_source") == "original"
+        if t == "b2b":
+            if not b2b or (original and b2b.get("currency_source") != "original"):
+                b2b = s
+        elif t == "permanent":
+            if not perm or (original and perm.get("currency_source") != "original"):
+                perm = s
+        elif t != "unknown" and not other:
+            other = s
+    return b2b, perm, other
+
+
+def _skills_strs(offer: dict) -> tuple[str, str]:
+    """
+    Formatuje stringi skills (required, nice_to_have) dla CSV i SQL.
+
+    Celowo bez cache'owania na dict ofercie: w trybie CSV_ONLY
+    save_to_staging robi pd.DataFrame(offers), wiec kazdy dopisany klucz
+    z underscore wyladowalby jako kolumna w staged CSV i wywracal
+    pozniejszy import przez csv_to_db.py.
+    """
+    return (
+        ", ".join(f"{sk['name']}({sk['level']})"
+                  for sk in offer.get("required_skills", [])),
+        ", ".join(f"{sk['name']}({sk['level']})"
+                  for sk in offer.get("nice_to_have_skills", [])),
+    )
+
+
+# Jeden wspoldzielony encoder dla sciezki stdlib — json.dumps buduje nowy
+# JSONEncoder przy kazdym wywolaniu, a tu serializujemy oferte po ofercie.
+_JSON_ENCODER = json.JSONEncoder(indent=2, ensure_ascii=False, default=str)
+
 
+def _write_output_json(filepath: str, metadata: dict, offers):
+    """Zapisuje output JSON strumieniowo: metadata + oferty jedna po drugiej.
 
-def export_csv(offers: list[dict], filepath: str):
+    Jeden orjson.dumps/json.dumps na cala strukture tworzy drugi pelny obraz
+    danych w pamieci (setki MB przy pelnym scrapie). Tu serializujemy oferte
+    po ofercie, wiec szczyt pamieci to jedna oferta, nie cala lista.
+    Zapis atomowy (tmp + os.replace) — przerwany run nie zostawia ucietego JSON-a.
+    """
+    if orjson is not None:
+        def _dumps(obj):
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2, default=str)
+    else:
+        def _dumps(obj):
+            return _JSON_ENCODER.encode(obj).encode("utf-8")
+
+    tmp = filepath + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(b'{\n"metadata": ')
+        f.write(_dumps(metadata))
+        f.write(b',\n"offers": [')
+        for i, offer in enumerate(offers):
+            f.write(b",\n" if i else b"\n")
+            f.write(_dumps(offer))
+        f.write(b"\n]\n}\n")
+    os.replace(tmp, filepath)
+
+
+def export_csv(offers, filepath: str):
     """
     Eksportuje oferty do CSV: jeden wiersz per oferta.
     Oddzielne kolumny salary per typ umowy (b2b, permanent).
+
+    Przyjmuje dowolny iterable ofert — wiersze pisane sa strumieniowo,
+    bez materializowania posrednich struktur.
     """
     CSV_COLUMNS = [
         "offer_id", "slug", "title", "company", "company_size", "city",
@@ -464,72 +973,42 @@ def export_csv(offers: list[dict], filepath: str):
         "url", "body_html", "scraped_at", "first_seen_at", "created_at",
     ]
 
-    with open(filepath, "w", encoding="utf-8-sig", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, delimiter=";",
-                                extrasaction="ignore")
-        writer.writeheader()
-
-        for offer in offers:
-            sals = offer.get("salaries", [])
-
-            b2b = _salary_for_type(sals, "b2b")
-            perm = _salary_for_type(sals, "permanent")
-
-            # Inne typy umow (mandate_contract, any, internship)
-            other = {}
-            for s in sals:
-                if s.get("type") not in ("b2b", "permanent", "unknown"):
-                    other = s
-                    break
-
-            req_skills = ", ".join(
-                f"{sk['name']}({sk['level']})" for sk in offer.get("required_skills", [])
-            )
-            nice_skills = ", ".join(
-                f"{sk['name']}({sk['level']})" for sk in offer.get("nice_to_have_skills", [])
-            )
-
-            row = {
-                "offer_id":         offer.get("offer_id", ""),
-                "slug":             offer.get("slug", ""),
-                "title":            offer.get("title", ""),
-                "company":          offer.get("company", ""),
-                "company_size":     offer.get("company_size", ""),
-                "city":             offer.get("city", ""),
-                "workplace_type":   offer.get("workplace_type", ""),
-                "working_time":     offer.get("working_time", ""),
-                "experience_level": offer.get("experience_level", ""),
-                "search_category":  offer.get("search_category", ""),
-                "published_at":     offer.get("published_at", ""),
-                # B2B
-                "b2b_from":     b2b.get("salary_from", ""),
-                "b2b_to":       b2b.get("salary_to", ""),
-                "b2b_currency": b2b.get("currency", ""),
-                "b2b_unit":     b2b.get("unit", ""),
-                "b2b_gross":    b2b.get("gross", ""),
-                # Permanent
-                "perm_from":     perm.get("salary_from", ""),
-                "perm_to":       perm.get("salary_to", ""),
-                "perm_currency": perm.get("currency", ""),
-                "perm_unit":     perm.get("unit", ""),
-                "perm_gross":    perm.get("gross", ""),
-                # Other
-                "other_type":     other.get("type", ""),
-                "other_from":     other.get("salary_from", ""),
-                "other_to":       other.get("salary_to", ""),
-                "other_currency": other.get("currency", ""),
-                "other_unit":     other.get("unit", ""),
-                # Skills
-                "required_skills":     req_skills,
-                "nice_to_have_skills": nice_skills,
-                "url":                 offer.get("url", ""),
-                "body_html":           offer.get("body_html", ""),
-                "scraped_at":          offer.get("scraped_at", ""),
-                "first_seen_at":       offer.get("scraped_at", ""),
-                "created_at":          offer.get("scraped_at", ""),
-            }
-            writer.writerow(row)
-
+    def _row(offer: dict) -> tuple:
+        # Krotka w kolejnosci CSV_COLUMNS — bez dict-per-wiersz i bez
+        # per-pole lookupu fieldnames, ktory robi DictWriter
+        b2b, perm, other = _split_salaries(offer.get("salaries", []))
+        req_skills, nice_skills = _skills_strs(offer)
+        scraped = offer.get("scraped_at", "")
+        return (
+            offer.get("offer_id", ""), offer.get("slug", ""),
+            offer.get("title", ""), offer.get("company", ""),
+            offer.get("company_size", ""), offer.get("city", ""),
+            offer.get("workplace_type", ""), offer.get("working_time", ""),
+            offer.get("experience_level", ""), offer["search_category"],
+            offer.get("published_at", ""),
+            # B2B
+            b2b.get("salary_from", ""), b2b.get("salary_to", ""),
+            b2b.get("currency", ""), b2b.get("unit", ""), b2b.get("gross", ""),
+            # Permanent
+            perm.get("salary_from", ""), perm.get("salary_to", ""),
+            perm.get("currency", ""), perm.get("unit", ""), perm.get("gross", ""),
+            # Other
+            other.get("type", ""), other.get("salary_from", ""),
+            other.get("salary_to", ""), other.get("currency", ""),
+            other.get("unit", ""),
+            # Skills
+            req_skills, nice_skills,
+            offer.get("url", ""), offer.get("body_html", ""),
+            scraped, scraped, scraped,
+        )
+
+    tmp = filepath + ".tmp"
+    with open(tmp, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(_row(offer) for offer in offers)
+
+    os.replace(tmp, filepath)
     print(f"  CSV zapisano do:   {filepath}")
 
 
@@ -540,22 +1019,8 @@ def _build_sql_params(offer: dict) -> tuple:
     Buduje 31-elementowa krotke parametrow dla MERGE_SQL.
     Kolejnosc musi odpowiadac ? w MERGE_SQL.
     """
-    sals = offer.get("salaries", [])
-    b2b = _salary_for_type(sals, "b2b")
-    perm = _salary_for_type(sals, "permanent")
-
-    other = {}
-    for s in sals:
-        if s.get("type") not in ("b2b", "permanent", "unknown"):
-            other = s
-            break
-
-    req_skills = ", ".join(
-        f"{sk['name']}({sk['level']})" for sk in offer.get("required_skills", [])
-    )
-    nice_skills = ", ".join(
-        f"{sk['name']}({sk['level']})" for sk in offer.get("nice_to_have_skills", [])
-    )
+    b2b, perm, other = _split_salaries(offer.get("salaries", []))
+    req_skills, nice_skills = _skills_strs(offer)
 
     def _s(v):
         if v is None:
@@ -572,7 +1037,7 @@ def _build_sql_params(offer: dict) -> tuple:
         _s(offer.get("workplace_type")),
         _s(offer.get("working_time")),
         _s(offer.get("experience_level")),
-        _s(offer.get("search_category")),
+        _s(offer["search_category"]),
         _s(offer.get("published_at")),
         # B2B
         _s(b2b.get("salary_from")),
@@ -647,27 +1112,60 @@ def upload_to_azure_sql(offers: list[dict]) -> dict:
         with conn:
             cursor = conn.cursor()
 
-            cursor.execute(CREATE_TABLE_SQL)
-            cursor.execute(ALTER_TABLE_SQL)
-            conn.commit()
-            print("  [SQL] Tabela justjoin_offers - OK")
+            global _SCHEMA_READY
+            if not _SCHEMA_READY:
+                cursor.execute(CREATE_TABLE_SQL)
+                cursor.execute(ALTER_TABLE_SQL)
+                conn.commit()
+                _SCHEMA_READY = True
+                print("  [SQL] Tabela justjoin_offers - OK")
 
             uploaded = 0
+            all_params = []
             for i, offer in enumerate(offers):
-                params = _build_sql_params(offer)
                 try:
-                    cursor.execute(MERGE_SQL, *params)
-                    uploaded += 1
+                    all_params.append(_build_sql_params(offer))
                 except Exception as e:
                     err = f"Wiersz {i} ({offer.get('url', '?')}): {e}"
-                    print(f"  [SQL] BLAD: {err}")
+                    logger.warning(f"  [SQL] BLAD: {err}")
                     result["errors"].append(err)
 
+            if all_params:
+                try:
+                    # Bulk: 1 staging insert (fast_executemany) + 1 MERGE
+                    # zamiast N round-tripow po 10-50ms kazdy
+                    cursor.execute(STAGE_CREATE_SQL)
+                    cursor.fast_executemany = True
+                    # Jawne typy parametrow zgodne z #stg_offers (patrz
+                    # komentarz przy _STAGE_PARAM_SIZES)
+                    cursor.setinputsizes(
+                        [(pyodbc.SQL_WVARCHAR, n, 0) for n in _STAGE_PARAM_SIZES])
+                    cursor.executemany(STAGE_INSERT_SQL, all_params)
+                    cursor.execute(STAGE_MERGE_SQL)
+                    cursor.execute("DROP TABLE #stg_offers;")
+                    uploaded = len(all_params)
+                except pyodbc.Error as e:
+                    # Bulk padl (np. dwie oferty z tym samym url w jednym runie
+                    # -> MERGE blad 8672) - powtorka wiersz po wierszu, zeby
+                    # zapisac dobre wiersze i wskazac winowajce
+                    print(f"  [SQL] Bulk MERGE padl ({e}) - fallback wiersz po wierszu")
+                    conn.rollback()
+                    cursor.setinputsizes(None)
+                    url_pos = 28  # pozycja url w krotce z _build_sql_params
+                    for i, vals in enumerate(all_params):
+                        try:
+                            cursor.execute(MERGE_SQL, *vals)
+                            uploaded += 1
+                        except Exception as e2:
+                            err = f"Wiersz {i} ({vals[url_pos] or '?'}): {e2}"
+                            print(f"  [SQL] BLAD: {err}")
+                            result["errors"].append(err)
+
             conn.commit()
             result["uploaded"] = uploaded
             print(f"  [SQL] Upload zakonczony: {uploaded}/{len(offers)} ofert")
 
-    except pyodbc.Error as e:
+    except Exception as e:
         msg = f"Blad SQL: {e}"
         print(f"  [SQL] {msg}")
         result["errors"].append(msg)
@@ -706,15 +1204,39 @@ def update_last_seen_sql(offer_ids: list[str]):
     try:
         with conn:
             cursor = conn.cursor()
-            # Batch po 500 offer_id (limit parametrow SQL)
-            batch_size = 500
-            updated = 0
-            for i in range(0, len(offer_ids), batch_size):
-                batch = offer_ids[i:i + batch_size]
-                placeholders = ",".join(["?"] * len(batch))
-                sql = f"UPDATE justjoin_offers SET created_at = GETDATE() WHERE offer_id IN ({placeholders})"
-                cursor.execute(sql, *batch)
-                updated += cursor.rowcount
+            ids = list(dict.fromkeys(offer_ids))
+            try:
+                # Temp table + JOIN zamiast batchy UPDATE ... IN (?,?,...x500):
+                # 1 round-trip, a server robi join zamiast parsowac N-elementowa liste
+                cursor.execute("CREATE TABLE #ids (offer_id NVARCHAR(200) PRIMARY KEY)")
+                cursor.fast_executemany = True
+                # Jawny typ parametru: sp_describe_undeclared_parameters nie
+                # widzi #temp tabel, wiec bez tego driver odrzuca insert
+                cursor.setinputsizes([(pyodbc.SQL_WVARCHAR, 200, 0)])
+                cursor.executemany("INSERT INTO #ids VALUES (?)",
+                                   [(oid,) for oid in ids])
+                cursor.setinputsizes(None)
+                cursor.execute(
+                    "UPDATE t SET created_at = GETDATE() "
+                    "FROM justjoin_offers t JOIN #ids i ON t.offer_id = i.offer_id"
+                )
+                updated = cursor.rowcount
+                cursor.execute("DROP TABLE #ids;")
+            except pyodbc.Error as e:
+                # Fallback: batchowane UPDATE ... IN - wolniejsze, ale nie
+                # zalezy od metadanych #temp tabeli
+                print(f"  [SQL] Temp-table UPDATE padl ({e}) - fallback na batche IN")
+                conn.rollback()
+                cursor.setinputsizes(None)
+                updated = 0
+                BATCH = 500
+                for start in range(0, len(ids), BATCH):
+                    chunk = ids[start:start + BATCH]
+                    placeholders = ", ".join("?" * len(chunk))
+                    cursor.execute(
+                        "UPDATE justjoin_offers SET created_at = GETDATE() "
+                        f"WHERE offer_id IN ({placeholders})", *chunk)
+                    updated += cursor.rowcount
             conn.commit()
             print(f"  [SQL] last_seen zaktualizowano dla {updated} ofert")
     except Exception as e:
@@ -723,15 +1245,28 @@ def update_last_seen_sql(offer_ids: list[str]):
 
 # --- Main pipeline ---
 
-def run(progress_callback=None, full_mode: bool = False) -> dict:
+def run(progress_callback=None, full_mode: bool = False,
+        rate_limit_mode: str = "normal") -> dict:
     """
     Glowna logika scrapera. Zwraca result dict kompatybilny z scraper_monitor.
 
     Args:
         progress_callback: Optional callback(current, total, phase) for progress tracking.
         full_mode: Jesli True, pomija cache i pobiera detale wszystkich ofert.
+        rate_limit_mode: Klucz z RATE_MODES (fast/aggressive/normal/conservative).
     """
     incremental = not full_mode
+    set_rate_mode(rate_limit_mode)
+
+    # Jedna konfiguracja logowania per proces; per-page/per-row komunikaty ida
+    # przez logger (429-waity na DEBUG), banery zostaja printami
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(message)s",
+                            stream=sys.stdout)
+
+    # Flaga mogla przyjsc z .env (ladowanego w main(), po imporcie modulu)
+    global STRIP_HTML
+    STRIP_HTML = os.environ.get("JJ_STRIP_HTML", "1") == "1"
 
     result = {
         "success": False,
@@ -764,18 +1299,28 @@ def run(progress_callback=None, full_mode: bool = False) -> dict:
     listing_counts: dict[str, int] = {}
     seen_ids: set[str] = set()
 
-    for cat in CATEGORIES:
-        items, total = collect_slugs_for_category(session, cat)
+    # Kategorie sa niezalezne — listing leci rownolegle (async lub watki)
+    if aiohttp is not None:
+        listing_results = asyncio.run(
+            _collect_all_async(session.cookies.get_dict()))
+    else:
+        with ThreadPoolExecutor(max_workers=len(CATEGORIES)) as pool:
+            listing_results = list(pool.map(
+                lambda cat: collect_slugs_for_category(session, cat),
+                CATEGORIES))
 
+    for cat, (items, total) in zip(CATEGORIES, listing_results):
         # Deduplikacja miedzy kategoriami po offer_id (stabilny UUID)
         unique = [it for it in items if it["offer_id"] not in seen_ids]
         seen_ids.update(it["offer_id"] for it in unique)
+        # Kategoria przypisana juz tu — downstream nie potrzebuje fallbackow .get()
+        for it in unique:
+            it["search_category"] = cat
         category_items[cat] = unique
         listing_counts[cat] = len(unique)
 
         print(f"  {cat.upper():12s}  pobrano {len(unique):>4d} ofert"
               f"  (total w kategorii: {total})")
-        polite_delay(1.0, 2.0)
 
     grand_total = sum(len(v) for v in category_items.values())
     print(f"\n  Lacznie: {grand_total} unikalnych ofert w listingu")
@@ -836,32 +1381,44 @@ def run(progress_callback=None, full_mode: bool = False) -> dict:
     stats: dict[str, int] = {}
     processed = 0
     errors = 0
+    # Jeden timestamp na cala faze — wszystkie oferty i tak pochodza z tego
+    # samego runu, a datetime.now()+isoformat per oferta to zbedny narzut
+    scraped_at_iso = datetime.now().isoformat()
+    # No-op zamiast checku "if progress_callback" przy kazdym wywolaniu
+    _cb = progress_callback or (lambda current, total, phase: None)
 
     for cat, items in category_items.items():
         print(f"  --- {cat.upper()} ({len(items)} ofert) ---")
         cat_offers = []
 
-        for item in items:
-            slug = item["slug"]
-            processed += 1
-            short = slug[:45] + ("..." if len(slug) > 45 else "")
-            print(f"    [{processed:3d}/{grand_total_details}] {short:50s}", end="  ")
-
-            if progress_callback:
-                progress_callback(processed, grand_total_details, "details")
-
-            offer = fetch_offer_details(session, slug)
-
-            if offer:
-                offer["search_category"] = cat
-                offer["scraped_at"] = datetime.now().isoformat()
-                cat_offers.append(offer)
-                print("OK")
+        if items:
+            def _progress(done, _base=processed):
+                _cb(_base + done, grand_total_details, "details")
+
+            # Drabinka klientow: httpx (HTTP/2) > aiohttp (HTTP/1.1 pool) > watki.
+            # --full pomija odczyt z cache'u odpowiedzi (zapis zostaje).
+            if httpx is not None:
+                results = asyncio.run(_gather_details_httpx(
+                    items, session.cookies.get_dict(), progress_cb=_progress,
+                    use_cache=incremental))
+            elif aiohttp is not None:
+                # Rownolegle: jeden event loop per kategoria, cookies z sesji requests
+                results = asyncio.run(_gather_details_async(
+                    items, session.cookies.get_dict(), progress_cb=_progress,
+                    use_cache=incremental))
             else:
-                errors += 1
-                print("SKIP")
-
-            polite_delay(1.0, 3.0)
+                # Fallback bez httpx/aiohttp: pula watkow na wspolnej sesji
+                results = _fetch_details_threaded(session, items, progress_cb=_progress,
+                                                  use_cache=incremental)
+            processed += len(items)
+
+            for offer in results:
+                if offer:
+                    offer["search_category"] = cat
+                    offer["scraped_at"] = scraped_at_iso
+                    cat_offers.append(offer)
+                else:
+                    errors += 1
 
         all_offers.extend(cat_offers)
         stats[cat] = len(cat_offers)
@@ -891,21 +1448,16 @@ def run(progress_callback=None, full_mode: bool = False) -> dict:
             result["errors"].append("Pobrano 0 ofert po filtrze PL!")
             return result
 
-    output = {
-        "metadata": {
-            "scraped_at":        datetime.now().isoformat(),
-            "source":            "justjoin.it",
-            "country_filter":    "PL",
-            "categories":        CATEGORIES,
-            "total_offers":      len(all_offers),
-            "stats_by_category": stats,
-            "errors_skipped":    errors,
-        },
-        "offers": all_offers,
+    metadata = {
+        "scraped_at":        datetime.now().isoformat(),
+        "source":            "justjoin.it",
+        "country_filter":    "PL",
+        "categories":        CATEGORIES,
+        "total_offers":      len(all_offers),
+        "stats_by_category": stats,
+        "errors_skipped":    errors,
     }
-
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False, default=str)
+    _write_output_json(OUTPUT_FILE, metadata, all_offers)
 
     # ---- CSV Export ----
     export_csv(all_offers, CSV_FILE)
@@ -917,9 +1469,9 @@ def run(progress_callback=None, full_mode: bool = False) -> dict:
         result["errors"].extend(sql_result["errors"])
 
     # ---- Zapis known_offers cache ----
-    # Zapisz PL oferty z publishedAt
-    for offer in all_offers:
-        known_offers[offer["offer_id"]] = offer.get("published_at", "")
+    # Zapisz PL oferty z publishedAt (jeden bulk update zamiast petli po kluczu)
+    known_offers.update(
+        {o["offer_id"]: o.get("published_at", "") for o in all_offers})
     # Zapisz tez zagraniczne offer_id (bez publishedAt) — unikamy ponownego fetchowania
     for oid in all_listing_offer_ids:
         known_offers.setdefault(oid, "")
@@ -972,9 +1524,10 @@ def main():
     _load_env()
 
     full_mode = "--full" in sys.argv
+    rate_mode = next((m for m in RATE_MODES if f"--{m}" in sys.argv), "normal")
 
     try:
-        result = run(full_mode=full_mode)
+        result = run(full_mode=full_mode, rate_limit_mode=rate_mode)
     except Exception as e:
         tb = traceback.format_exc()
         print(f"\n[MONITOR] Scraper rzucil wyjatek:\n{tb}")
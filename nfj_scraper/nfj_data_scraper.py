@@ -8,6 +8,9 @@ Tracks first_seen / last_seen / is_active for time-series analysis.
 Part of Portfolio Data Factory — "AI Skill Premium" analysis.
 """
 
+import asyncio
+import atexit
+import itertools
 import json
 import os
 import random
@@ -15,11 +18,30 @@ import sys
 import time
 import traceback
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
 import pyodbc
 import pandas as pd
 from datetime import datetime, timezone
 from pathlib import Path
 
+try:
+    import orjson  # C-speed JSON parse straight from response bytes
+except ImportError:
+    orjson = None
+
+try:
+    import aiohttp  # async HTTP dla Stage 2 — setki requestów bez wątków OS
+except ImportError:
+    aiohttp = None
+
+try:
+    import pyarrow as pa  # C++ CSV writer, much faster than df.to_csv
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+
 if sys.platform == "win32":
     sys.stdout.reconfigure(encoding='utf-8')
 
@@ -61,6 +83,30 @@ HEADERS = {
     "Referer": "https://nofluffjobs.com/pl/praca-it",
 }
 
+def _loads(content: bytes):
+    """Parse response bytes with orjson when available (skips the bytes->str
+    decode stdlib resp.json() does); falls back to stdlib json."""
+    return orjson.loads(content) if orjson is not None else json.loads(content)
+
+
+def _dumps(obj, *, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 bytes with orjson when available (3-6x faster parse,
+    do 10x na dump); falls back to stdlib json."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False,
+                      indent=2 if indent else None).encode("utf-8")
+
+
+# Shared session: keep-alive zamiast nowego TCP+TLS handshake (~150-400 ms)
+# na każdej stronie listingu / każdym detail requeście. Retry przejściowych
+# błędów sieci zostaje w _request_with_retry (HTTP 4xx/5xx celowo bez retry).
+# Nagłówki ustawione raz na sesji — wywołania nie przekazują headers=HEADERS.
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=20))
+atexit.register(_SESSION.close)
+
 # Premium basket: display groups → search-style category names
 PREMIUM_BASKET = {
     "tech_core": [
@@ -77,11 +123,53 @@ PREMIUM_BASKET = {
 }
 
 MASTER_CSV = SCRAPER_DIR / "nfj_master.csv"
+# Kanoniczny format mastera: Parquet (typowany, kolumnowy, ~5x mniejszy,
+# 10-20x szybszy odczyt). CSV zostaje jako artefakt do ręcznej inspekcji.
+MASTER_PARQUET = SCRAPER_DIR / "nfj_master.parquet"
 SNAPSHOT_JSON = SCRAPER_DIR / "nfj_latest_snapshot.json"
-CHECKPOINT_FILE = SCRAPER_DIR / "nfj_checkpoint.json"
+# Append-only JSONL: jeden rekord per wzbogacona oferta. Pelny rewrite
+# checkpointu co CHECKPOINT_EVERY ofert byl O(n^2) bajtow na caly run.
+CHECKPOINT_JSONL = SCRAPER_DIR / "nfj_checkpoint.jsonl"
 DETAIL_DELAY = (1, 2)
 LISTING_DELAY = (1, 3)
 CHECKPOINT_EVERY = 50
+DETAIL_WORKERS = 8
+
+
+def _parse_retry_after(headers) -> float | None:
+    """Parse a numeric Retry-After header (seconds); None when absent/invalid."""
+    ra = headers.get("Retry-After") if headers else None
+    if ra is None:
+        return None
+    try:
+        return float(ra)
+    except ValueError:
+        return None
+
+
+class Throttle:
+    """Adaptive delay for the detail loop: stay fast while the server is
+    happy, escalate only on 429/503. The fixed DETAIL_DELAY made idle sleep
+    dominate Stage 2 wall time (~1.5 s per offer, throttled or not)."""
+
+    def __init__(self, base: float = 0.2, floor: float = 0.1, cap: float = 5.0):
+        self.delay = base
+        self.floor = floor
+        self.cap = cap
+
+    def on_success(self):
+        self.delay = max(self.floor, self.delay * 0.9)
+
+    def on_throttle(self, retry_after: float | None = None):
+        # AIMD: podwojenie, ale nie mniej niż serwerowe Retry-After
+        self.delay = min(self.cap, max(self.delay * 2, retry_after or 0.0))
+
+    def wait(self) -> float:
+        # Jitter ±20% proporcjonalny do opóźnienia — desynchronizuje workerów
+        return random.uniform(self.delay * 0.8, self.delay * 1.2)
+
+    def sleep(self):
+        time.sleep(self.wait())
 
 
 # ============================================================
@@ -89,7 +177,12 @@ CHECKPOINT_EVERY = 50
 # ============================================================
 
 def load_master() -> pd.DataFrame:
-    """Load existing master CSV or return empty DataFrame."""
+    """Load existing master (Parquet preferred, CSV fallback) or return empty DataFrame."""
+    if pa is not None and MASTER_PARQUET.exists():
+        df = pd.read_parquet(MASTER_PARQUET)
+        print(f"  Loaded master: {len(df)} rows, {df['reference'].nunique()} unique references")
+        return df
+
     path = Path(MASTER_CSV)
     if path.exists() and path.stat().st_size > 0:
         df = pd.read_csv(path, encoding="utf-8-sig")
@@ -107,8 +200,15 @@ def load_master() -> pd.DataFrame:
 
 
 def save_master(df: pd.DataFrame) -> None:
-    """Save master dataset to CSV."""
-    df.to_csv(MASTER_CSV, index=False, encoding="utf-8-sig")
+    """Save master dataset: Parquet (canonical) + CSV (human inspection)."""
+    if pa is not None:
+        df.to_parquet(MASTER_PARQUET, index=False)  # snappy domyślnie
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with open(MASTER_CSV, "wb") as f:
+            f.write(b"\xef\xbb\xbf")  # BOM — zgodność z Excelem (utf-8-sig)
+            pacsv.write_csv(table, f)
+    else:
+        df.to_csv(MASTER_CSV, index=False, encoding="utf-8-sig")
     active = df["is_active"].sum() if "is_active" in df.columns else len(df)
     print(f"[OK] Master saved: {len(df)} total rows, {int(active)} active -> {MASTER_CSV}")
 
@@ -126,7 +226,7 @@ def _request_with_retry(method: str, url: str, *, max_retries: int = 4,
     last_exc = None
     for attempt in range(1, max_retries + 1):
         try:
-            resp = requests.request(method, url, **kwargs)
+            resp = _SESSION.request(method, url, **kwargs)
             resp.raise_for_status()
             return resp
         except (requests.exceptions.ConnectionError,
@@ -162,10 +262,9 @@ def fetch_category(category: str) -> list[dict]:
             API_SEARCH_URL,
             params={"salaryCurrency": "PLN", "salaryPeriod": "month", "page": page},
             json=payload,
-            headers=HEADERS,
             timeout=30,
         )
-        data = resp.json()
+        data = _loads(resp.content)
         postings = data.get("postings", [])
         total_pages = data.get("totalPages", 1)
         all_offers.extend(postings)
@@ -188,15 +287,25 @@ def fetch_listings() -> list[dict]:
     all_postings = []
     total_raw = 0
 
+    # Kategorie są niezależne — odpalamy je równolegle na współdzielonej
+    # sesji (pool_maxsize >= liczba workerów). Wyniki składamy w kolejności
+    # all_categories, żeby dedup "first occurrence wins" dawał te same
+    # przypisania kategorii co przebieg sekwencyjny.
+    print(f"  Fetching {len(all_categories)} categories (4 parallel workers)...",
+          flush=True)
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        futures = {ex.submit(fetch_category, cat): cat for cat in all_categories}
+        results: dict[str, list[dict]] = {}
+        for fut in as_completed(futures):
+            results[futures[fut]] = fut.result()
+
     for i, cat in enumerate(all_categories, 1):
-        print(f"  [{i}/{len(all_categories)}] Fetching: {cat}...", end=" ", flush=True)
-        offers = fetch_category(cat)
+        offers = results[cat]
         for o in offers:
             o["scraper_category"] = cat
         all_postings.extend(offers)
         total_raw += len(offers)
-        print(f"OK — {len(offers)} offers")
-        time.sleep(random.uniform(*LISTING_DELAY))
+        print(f"  [{i}/{len(all_categories)}] {cat}: {len(offers)} offers")
 
     # Dedup by reference (stable key from Search API)
     # First occurrence wins — preserves the first category assignment
@@ -221,16 +330,15 @@ def fetch_listings() -> list[dict]:
 # STAGE 2: DETAILS ENRICHMENT
 # ============================================================
 
-def fetch_posting_detail(posting_id: str) -> dict | None:
+def fetch_posting_detail(posting_id: str, session: requests.Session = _SESSION) -> dict | None:
     """Fetch full details for a single posting. Returns reference + enrichment data."""
-    response = requests.get(
-        f"{API_DETAIL_URL}/{posting_id}",
-        headers=HEADERS,
-        timeout=30,
-    )
+    response = session.get(f"{API_DETAIL_URL}/{posting_id}", timeout=30)
     response.raise_for_status()
-    data = response.json()
+    return _extract_detail(_loads(response.content))
 
+
+def _extract_detail(data: dict) -> dict:
+    """Pull the enrichment fields out of one parsed detail payload."""
     reqs = data.get("requirements", {})
     essentials = data.get("essentials", {})
     original_salary = essentials.get("originalSalary", {})
@@ -266,24 +374,31 @@ def fetch_posting_detail(posting_id: str) -> dict | None:
 
 
 def load_checkpoint() -> dict:
-    """Load checkpoint of already-fetched detail IDs."""
-    path = Path(CHECKPOINT_FILE)
-    if path.exists():
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    """Load checkpoint of already-fetched details from append-only JSONL."""
+    checkpoint: dict = {}
+    if CHECKPOINT_JSONL.exists():
+        with open(CHECKPOINT_JSONL, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    rec = _loads(line)
+                    checkpoint[rec["pid"]] = rec["detail"]
+    return checkpoint
 
 
-def save_checkpoint(details: dict) -> None:
-    """Save checkpoint to disk."""
-    with open(CHECKPOINT_FILE, "w", encoding="utf-8") as f:
-        json.dump(details, f, ensure_ascii=False)
+def append_checkpoint(pid: str, detail: dict) -> None:
+    """Append one enrichment record to the JSONL checkpoint (O(1) per offer)."""
+    with open(CHECKPOINT_JSONL, "ab") as f:
+        f.write(_dumps({"pid": pid, "detail": detail}) + b"\n")
 
 
 def fetch_details(postings: list[dict], progress_callback=None) -> list[dict]:
     """Stage 2: Enrich each posting with full details from detail endpoint.
 
-    Checkpoint keyed by posting ID (stable for resume).
+    Checkpoint keyed by posting ID (stable for resume). Detail GETs are pure
+    RTT (~100-500 ms each), so they run on a DETAIL_WORKERS thread pool over
+    the shared keep-alive session; all state (checkpoint, counters, log) is
+    mutated only by the main thread consuming `as_completed`.
     """
     if not postings:
         print("  No new postings to enrich.")
@@ -294,49 +409,125 @@ def fetch_details(postings: list[dict], progress_callback=None) -> list[dict]:
     enriched = 0
     skipped = 0
     failed = 0
-    start_time = time.time()
-
-    for i, posting in enumerate(postings):
+    throttle = Throttle()
+    # Per-offer lines buffered and flushed with each checkpoint: two flushed
+    # prints per offer = two syscalls each, noticeable when stdout is piped
+    # (scraper_monitor) and doubly re-encoded on Windows.
+    log_buf: list[str] = []
+
+    def _flush_log():
+        if log_buf:
+            sys.stdout.write("\n".join(log_buf) + "\n")
+            sys.stdout.flush()
+            log_buf.clear()
+
+    # Resume from checkpoint (keyed by posting id) — no network needed
+    todo = []
+    for posting in postings:
         pid = posting["id"]
-
-        # Resume from checkpoint (keyed by posting id)
         if pid in checkpoint:
             detail = checkpoint[pid]
-            for key in detail:
-                posting[key] = detail[key]
+            posting.update(detail)
             skipped += 1
-            continue
+        else:
+            todo.append(posting)
+
+    start_time = time.time()
+    done = 0
+
+    def _handle(posting: dict, detail: dict | None,
+                http_status: int | None = None, retry_after: float | None = None,
+                error=None):
+        # Wspólna księgowość dla obu backendów (aiohttp / thread pool):
+        # merge do postingu, checkpoint, log, feedback do throttle'a
+        nonlocal enriched, failed, done
+        done += 1
+        pid = posting["id"]
 
         if progress_callback:
-            progress_callback(i + 1, total, "details")
+            progress_callback(skipped + done, total, "details")
 
         elapsed = time.time() - start_time
-        rate = (enriched + skipped) / elapsed if elapsed > 0 else 0
-        remaining = (total - i) / rate / 60 if rate > 0 else 0
-        print(f"  [{i + 1}/{total}] {pid[:60]}...", end=" ")
+        rate = done / elapsed if elapsed > 0 else 0
+        remaining = (len(todo) - done) / rate / 60 if rate > 0 else 0
+        prefix = f"  [{skipped + done}/{total}] {pid[:60]}..."
 
-        try:
-            detail = fetch_posting_detail(pid)
-            for key in detail:
-                posting[key] = detail[key]
-            checkpoint[pid] = detail
+        if detail is not None:
+            posting.update(detail)
+            append_checkpoint(pid, detail)
             enriched += 1
             musts_count = len(detail["must_have_skills"])
             nices_count = len(detail["nice_to_have_skills"])
-            print(f"OK ({musts_count}m/{nices_count}n) ~{remaining:.0f}min left")
-        except requests.exceptions.HTTPError as e:
-            print(f"FAILED (HTTP {e.response.status_code})")
+            log_buf.append(f"{prefix} OK ({musts_count}m/{nices_count}n)"
+                           f" ~{remaining:.0f}min left")
+            throttle.on_success()
+        elif http_status is not None:
+            log_buf.append(f"{prefix} FAILED (HTTP {http_status})")
             failed += 1
-        except requests.exceptions.RequestException as e:
-            print(f"FAILED ({e})")
+            if http_status in (429, 503):
+                throttle.on_throttle(retry_after)
+        else:
+            log_buf.append(f"{prefix} FAILED ({error})")
             failed += 1
 
         if enriched % CHECKPOINT_EVERY == 0 and enriched > 0:
-            save_checkpoint(checkpoint)
-
-        time.sleep(random.uniform(*DETAIL_DELAY))
+            _flush_log()
+
+    def _run_threaded():
+        def _worker(posting: dict) -> dict | None:
+            # Współdzielony throttle rozkłada tempo na cały pool — przy
+            # 429/503 wszystkie workery zwalniają razem
+            throttle.sleep()
+            return fetch_posting_detail(posting["id"])
+
+        with ThreadPoolExecutor(max_workers=DETAIL_WORKERS) as ex:
+            futures = {ex.submit(_worker, p): p for p in todo}
+            for fut in as_completed(futures):
+                posting = futures[fut]
+                try:
+                    detail = fut.result()
+                except requests.exceptions.HTTPError as e:
+                    _handle(posting, None, http_status=e.response.status_code,
+                            retry_after=_parse_retry_after(e.response.headers))
+                except requests.exceptions.RequestException as e:
+                    _handle(posting, None, error=e)
+                else:
+                    _handle(posting, detail)
+
+    async def _run_aiohttp():
+        sem = asyncio.Semaphore(DETAIL_WORKERS)
+        connector = aiohttp.TCPConnector(limit=DETAIL_WORKERS * 2,
+                                         ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(headers=HEADERS, timeout=timeout,
+                                         connector=connector) as session:
+
+            async def _one(posting: dict):
+                try:
+                    async with sem:
+                        await asyncio.sleep(throttle.wait())
+                        async with session.get(
+                            f"{API_DETAIL_URL}/{posting['id']}",
+                            raise_for_status=True,
+                        ) as resp:
+                            raw = await resp.read()
+                    return posting, _extract_detail(_loads(raw)), None, None, None
+                except aiohttp.ClientResponseError as e:
+                    return posting, None, e.status, _parse_retry_after(e.headers), None
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    return posting, None, None, None, e
+
+            for coro in asyncio.as_completed([_one(p) for p in todo]):
+                posting, detail, status, retry_after, err = await coro
+                _handle(posting, detail, http_status=status,
+                        retry_after=retry_after, error=err)
+
+    if aiohttp is not None:
+        asyncio.run(_run_aiohttp())
+    else:
+        _run_threaded()
 
-    save_checkpoint(checkpoint)
+    _flush_log()
     print(f"\n  Details: {enriched} fetched, {skipped} from cache, {failed} failed")
 
     return postings
@@ -346,6 +537,17 @@ def fetch_details(postings: list[dict], progress_callback=None) -> list[dict]:
 # TRANSFORM: FLATTEN TO DATAFRAME
 # ============================================================
 
+_PERIOD_MAP = {"month": "mies.", "hour": "godz.", "day": "dzień", "year": "rok"}
+
+
+@lru_cache(maxsize=4096)
+def _fmt_salary_cached(lo, hi, currency: str, period_label: str) -> str:
+    # Widełki mocno się powtarzają między ofertami — memoizacja per krotka
+    lo_str = f"{lo:,.0f}".replace(",", " ")
+    hi_str = f"{hi:,.0f}".replace(",", " ")
+    return f"{lo_str} – {hi_str} {currency}/{period_label}"
+
+
 def _format_salary(salary_data: dict) -> str | None:
     """Format NFJ salary range like Pracuj: '15 325 – 22 500 PLN/mies.'"""
     if not salary_data:
@@ -353,78 +555,100 @@ def _format_salary(salary_data: dict) -> str | None:
     rng = salary_data.get("range", [])
     if not rng or len(rng) < 2 or rng[0] is None:
         return None
-    lo, hi = rng[0], rng[1]
-    currency = salary_data.get("currency", "PLN")
     period = salary_data.get("period", "month")
-    period_map = {"month": "mies.", "hour": "godz.", "day": "dzień", "year": "rok"}
-    period_label = period_map.get(period, period)
-    lo_str = f"{lo:,.0f}".replace(",", " ")
-    hi_str = f"{hi:,.0f}".replace(",", " ")
-    return f"{lo_str} – {hi_str} {currency}/{period_label}"
+    return _fmt_salary_cached(rng[0], rng[1],
+                              salary_data.get("currency", "PLN"),
+                              _PERIOD_MAP.get(period, period))
+
+
+def _classify_work_mode(full_remote: bool, remote_100: bool,
+                        hybrid_desc: bool, partial_remote: bool) -> str:
+    """Predicate used once at import time to fill _MODE_TABLE."""
+    if full_remote or remote_100:
+        return "Remote"
+    if hybrid_desc or partial_remote:
+        return "Hybrid"
+    return "Office"
+
+
+# Wszystkie 16 kombinacji cech policzonych raz — per wiersz zostaje samo
+# zbudowanie krotki i lookup w dict zamiast drabinki ifów
+_MODE_TABLE = {
+    key: _classify_work_mode(*key)
+    for key in itertools.product((False, True), repeat=4)
+}
 
 
 def _build_work_mode(posting: dict) -> str:
     """Determine work mode: Remote / Hybrid / Office.
 
     Checks multiple sources because Listing API uses ``fullyRemote`` (bool)
-    while Detail API uses ``location.remote`` (int, e.g. 100 = fully remote).
+    while Detail API uses ``location.remote`` (int, e.g. 100 = fully remote,
+    partial values = hybrid).
     """
     location_detail = posting.get("location_detail") or {}
     location_listing = posting.get("location", {})
-
-    # 1. Listing API top-level flag (most reliable)
-    if posting.get("fullyRemote", False):
-        return "Remote"
-    # 2. Listing API location.fullyRemote
-    if location_listing.get("fullyRemote", False):
-        return "Remote"
-    # 3. Detail API location.remote (int: 0 = office, 100 = fully remote)
     remote_int = location_detail.get("remote")
-    if remote_int is not None and remote_int >= 100:
-        return "Remote"
-
-    # Hybrid: hybridDesc present or partial remote
-    hybrid = location_detail.get("hybridDesc") or location_listing.get("hybridDesc") or ""
-    if hybrid:
-        return "Hybrid"
-    if remote_int and remote_int not in (0, False, None):
-        return "Hybrid"
-
-    return "Office"
+    hybrid = (location_detail.get("hybridDesc")
+              or location_listing.get("hybridDesc") or "")
+
+    key = (
+        bool(posting.get("fullyRemote") or location_listing.get("fullyRemote")),
+        remote_int is not None and remote_int >= 100,
+        bool(hybrid),
+        bool(remote_int),
+    )
+    return _MODE_TABLE[key]
 
 
 def _build_body_html(posting: dict) -> str | None:
     """Build combined body_html from detail sections."""
-    parts = []
     desc = posting.get("body_description", "")
+    tasks = posting.get("daily_tasks", [])
+    req_desc = posting.get("requirements_description", "")
+
+    # Gorąca ścieżka: komplet sekcji (typowa oferta) — jeden f-string zamiast
+    # listy parts + join; ten sam output co ścieżka ogólna
+    if desc and req_desc and tasks and isinstance(tasks, list):
+        tasks_html = "\n".join(f"<li>{t}</li>" for t in tasks)
+        return (f"[description]\n{desc}\n---\n"
+                f"[dailyTasks]\n<ul>{tasks_html}</ul>\n---\n"
+                f"[requirements]\n{req_desc}")
+
+    parts = []
     if desc:
         parts.append(f"[description]\n{desc}")
-    tasks = posting.get("daily_tasks", [])
     if tasks:
         if isinstance(tasks, list):
             tasks_html = "\n".join(f"<li>{t}</li>" for t in tasks)
             parts.append(f"[dailyTasks]\n<ul>{tasks_html}</ul>")
         else:
             parts.append(f"[dailyTasks]\n{tasks}")
-    req_desc = posting.get("requirements_description", "")
     if req_desc:
         parts.append(f"[requirements]\n{req_desc}")
     return "\n---\n".join(parts) if parts else None
 
 
-def flatten_posting(posting: dict) -> dict:
-    """Extract a flat dict from one enriched posting — unified schema matching Pracuj.pl."""
+def flatten_posting(posting: dict, scraped_at: str | None = None) -> dict:
+    """Extract a flat dict from one enriched posting — unified schema matching Pracuj.pl.
+
+    ``scraped_at`` is passed in by callers flattening a whole batch so the
+    timestamp is computed once per run, not once per row.
+    """
     location = posting.get("location_detail") or posting.get("location", {})
     places = location.get("places", [])
 
-    # Build location string: "Remote; Kraków; Warszawa"
-    is_remote = location.get("fullyRemote", False)
+    # Build location string: "Remote; Kraków; Warszawa" — jeden przebieg po
+    # places zamiast dwóch (zbieranie miast + osobny any() na "Remote")
+    has_remote = location.get("fullyRemote", False)
     cities = []
     for place in places:
         city = place.get("city", "")
-        if city and city != "Remote":
+        if city == "Remote":
+            has_remote = True
+        elif city:
             cities.append(city)
-    if is_remote or any(p.get("city") == "Remote" for p in places):
+    if has_remote:
         cities.insert(0, "Remote")
 
     musts = posting.get("must_have_skills", [])
@@ -457,13 +681,6 @@ def flatten_posting(posting: dict) -> dict:
     else:
         position_level = None
 
-    # Published at
-    posted_ts = posting.get("posted")
-    published_at = (
-        datetime.fromtimestamp(posted_ts / 1000, tz=timezone.utc).isoformat()
-        if posted_ts else None
-    )
-
     # Full URL
     default_url = posting.get("defaultUrl") or posting.get("url") or posting.get("id", "")
     full_url = f"https://nofluffjobs.com/pl/job/{default_url}"
@@ -486,11 +703,35 @@ def flatten_posting(posting: dict) -> dict:
         "contract_types": "; ".join(contract_parts) if contract_parts else None,
         "work_mode": _build_work_mode(posting),
         "nfj_category": posting.get("nfj_category") or posting.get("category"),
-        "published_at": published_at,
-        "scraped_at": datetime.now(timezone.utc).isoformat(),
+        # Surowy epoch ms — na ISO konwertuje wektorowo _published_at_series
+        # po zbudowaniu DataFrame'u
+        "published_at": posting.get("posted") or None,
+        "scraped_at": scraped_at or datetime.now(timezone.utc).isoformat(),
     }
 
 
+def _published_at_series(s: pd.Series) -> pd.Series:
+    """Convert raw epoch-ms `posted` values to ISO-8601 UTC strings in one
+    vectorized pass (C-level) instead of datetime.fromtimestamp per row.
+
+    Keeps the ``.%f`` fraction so new rows match the microsecond format
+    the per-row ``isoformat()`` wrote into the persisted master."""
+    dt = pd.to_datetime(s, unit="ms", utc=True, errors="coerce")
+    out = dt.dt.strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+    return out.where(dt.notna(), None)
+
+
+# Stały schemat flatten_posting — DataFrame'y budowane z from_records(columns=...)
+# pomijają inferencję kolumn; ta sama lista zasila upload SQL
+_FLAT_COLS = [
+    "reference", "category", "job_title", "company", "location",
+    "salary_uop", "salary_b2b", "skills_required", "skills_nice_to_have",
+    "requirements_expected", "requirements_nice_to_have", "body_html",
+    "url", "position_level", "contract_types", "work_mode",
+    "nfj_category", "published_at", "scraped_at",
+]
+
+
 # ============================================================
 # INCREMENTAL RECONCILIATION
 # ============================================================
@@ -517,24 +758,27 @@ def reconcile(master: pd.DataFrame, current_listings: list[dict]) -> tuple[list[
         ref = p.get("reference") or p.get("id")
         current_refs[ref] = p
 
-    known_refs = set(master["reference"].dropna().unique())
-    current_ref_set = set(current_refs.keys())
+    # Set ops na pd.Index zamiast pythonowych setów — hash table na poziomie C,
+    # a wynik idzie prosto do .isin bez ponownej materializacji
+    known_idx = pd.Index(master["reference"].dropna().unique())
+    current_idx = pd.Index(current_refs.keys())
 
-    still_active = current_ref_set & known_refs
-    new_refs = current_ref_set - known_refs
-    expired = known_refs - current_ref_set
+    still_active = current_idx.intersection(known_idx)
+    new_refs = current_idx.difference(known_idx)
+    expired = known_idx.difference(current_idx)
 
     # Update last_seen for still-active offers
-    if still_active:
+    if len(still_active):
         mask = master["reference"].isin(still_active)
         master.loc[mask, "last_seen_at"] = now
         master.loc[mask, "is_active"] = True
 
     # Mark expired offers
-    if expired:
+    if len(expired):
         master.loc[master["reference"].isin(expired), "is_active"] = False
 
-    new_postings = [p for p in current_listings if (p.get("reference") or p.get("id")) in new_refs]
+    new_ref_set = set(new_refs)
+    new_postings = [p for p in current_listings if (p.get("reference") or p.get("id")) in new_ref_set]
 
     print(f"  Reconciliation:")
     print(f"    Still active:  {len(still_active)}")
@@ -554,20 +798,29 @@ def print_summary(master: pd.DataFrame, new_count: int, run_timestamp: str) -> N
     print(f"  RUN SUMMARY — {run_timestamp}")
     print("=" * 55)
 
-    active = master[master["is_active"] == True] if "is_active" in master.columns else master
-    expired = master[master["is_active"] == False] if "is_active" in master.columns else pd.DataFrame()
+    # Jedna maska + jedno value_counts zamiast skanu kolumny per kategoria
+    if "is_active" in master.columns:
+        active_mask = master["is_active"] == True
+        active = master.loc[active_mask]
+        expired_count = int((~active_mask).sum())
+    else:
+        active = master
+        expired_count = 0
 
     print(f"\n  New offers this run:     {new_count}")
     print(f"  Active offers total:     {len(active)}")
-    print(f"  Expired offers total:    {len(expired)}")
+    print(f"  Expired offers total:    {expired_count}")
     print(f"  Master dataset size:     {len(master)}")
 
+    counts = (active["category"].value_counts().to_dict()
+              if len(active) and "category" in active.columns else {})
+
     print(f"\n  [BY CATEGORY — ACTIVE]")
     for group_name, categories in PREMIUM_BASKET.items():
         label = group_name.replace("_", " ").upper()
         print(f"\n  [{label}]")
         for cat in categories:
-            count = len(active[active["category"] == cat]) if len(active) else 0
+            count = counts.get(cat, 0)
             status = f"{count:>5} offers" if count else "    — EMPTY"
             print(f"    {cat:<25} {status}")
 
@@ -607,6 +860,28 @@ CREATE TABLE nfj_offers (
 );
 """
 
+# Migration: add first_seen_at / created_at if missing (table may have existed before)
+ALTER_FIRST_SEEN_SQL = """
+IF NOT EXISTS (
+    SELECT 1 FROM sys.columns
+    WHERE object_id = OBJECT_ID('nfj_offers')
+      AND name = 'first_seen_at'
+)
+ALTER TABLE nfj_offers ADD first_seen_at DATETIME DEFAULT GETDATE();
+"""
+
+ALTER_CREATED_AT_SQL = """
+IF NOT EXISTS (
+    SELECT 1 FROM sys.columns
+    WHERE object_id = OBJECT_ID('nfj_offers')
+      AND name = 'created_at'
+)
+ALTER TABLE nfj_offers ADD created_at DATETIME DEFAULT GETDATE();
+"""
+
+# Jeden batch T-SQL zamiast 3 round-tripów; guardy IF NOT EXISTS zostają
+BOOTSTRAP_SQL = CREATE_TABLE_SQL + "\n" + ALTER_FIRST_SEEN_SQL + "\n" + ALTER_CREATED_AT_SQL
+
 MERGE_SQL = """
 MERGE INTO nfj_offers AS T
 USING (SELECT ? as reference, ? as category, ? as job_title, ? as company,
@@ -643,14 +918,51 @@ WHEN NOT MATCHED THEN INSERT
             GETDATE());
 """
 
-_SQL_COLUMNS = [
-    "reference", "category", "job_title", "company", "location",
-    "salary_uop", "salary_b2b", "skills_required", "skills_nice_to_have",
-    "requirements_expected", "requirements_nice_to_have", "body_html",
-    "url", "position_level", "contract_types", "work_mode",
-    "nfj_category", "published_at", "scraped_at",
+_SQL_COLUMNS = list(_FLAT_COLS)
+
+STAGE_CREATE_SQL = """
+CREATE TABLE #stg_nfj (
+    reference                 NVARCHAR(200),
+    category                  NVARCHAR(50),
+    job_title                 NVARCHAR(500),
+    company                   NVARCHAR(500),
+    location                  NVARCHAR(500),
+    salary_uop                NVARCHAR(200),
+    salary_b2b                NVARCHAR(200),
+    skills_required           NVARCHAR(MAX),
+    skills_nice_to_have       NVARCHAR(MAX),
+    requirements_expected     NVARCHAR(MAX),
+    requirements_nice_to_have NVARCHAR(MAX),
+    body_html                 NVARCHAR(MAX),
+    url                       NVARCHAR(1000),
+    position_level            NVARCHAR(200),
+    contract_types            NVARCHAR(200),
+    work_mode                 NVARCHAR(200),
+    nfj_category              NVARCHAR(200),
+    published_at              NVARCHAR(50),
+    scraped_at                NVARCHAR(50)
+);
+"""
+
+STAGE_INSERT_SQL = "INSERT INTO #stg_nfj VALUES (" + ", ".join(["?"] * 19) + ")"
+
+# Jawne typy parametrów stagingu (NVARCHAR, 0 = MAX) w kolejności insertu —
+# sp_describe_undeclared_parameters nie widzi #temp tabel, więc driver nie
+# umie sam wywnioskować metadanych dla fast_executemany
+_STAGE_INPUT_SIZES = [
+    (pyodbc.SQL_WVARCHAR, n, 0)
+    for n in (200, 50, 500, 500, 500, 200, 200,  # reference..salary_b2b
+              0, 0, 0, 0, 0,                     # skills/requirements/body (MAX)
+              1000, 200, 200, 200, 200, 50, 50)  # url..scraped_at
 ]
 
+# Ten sam MERGE, ale źródłem jest staging table zamiast 19 parametrów per wiersz
+STAGE_MERGE_SQL = (
+    MERGE_SQL[:MERGE_SQL.index("USING")]
+    + "USING #stg_nfj AS S\n"
+    + MERGE_SQL[MERGE_SQL.index("ON T.url = S.url"):]
+)
+
 
 def upload_to_azure_sql(df: pd.DataFrame) -> dict:
     """
@@ -695,47 +1007,49 @@ def upload_to_azure_sql(df: pd.DataFrame) -> dict:
         with conn:
             cursor = conn.cursor()
 
-            # Auto-create table
-            cursor.execute(CREATE_TABLE_SQL)
-            # Migration: add first_seen_at if missing (table may have existed before)
-            cursor.execute("""
-                IF NOT EXISTS (
-                    SELECT 1 FROM sys.columns
-                    WHERE object_id = OBJECT_ID('nfj_offers')
-                      AND name = 'first_seen_at'
-                )
-                ALTER TABLE nfj_offers ADD first_seen_at DATETIME DEFAULT GETDATE();
-            """)
-            cursor.execute("""
-                IF NOT EXISTS (
-                    SELECT 1 FROM sys.columns
-                    WHERE object_id = OBJECT_ID('nfj_offers')
-                      AND name = 'created_at'
-                )
-                ALTER TABLE nfj_offers ADD created_at DATETIME DEFAULT GETDATE();
-            """)
+            # Auto-create table + migracje kolumn w jednym batchu
+            cursor.execute(BOOTSTRAP_SQL)
             conn.commit()
             print("  [SQL] Tabela nfj_offers — OK")
 
-            # MERGE row-by-row
-            uploaded = 0
-            for idx, row in df.iterrows():
-                vals = []
-                for col in _SQL_COLUMNS:
-                    v = row.get(col, "")
-                    if pd.isna(v):
-                        v = None
-                    elif isinstance(v, str):
-                        v = v.strip()
-                    vals.append(v)
+            # MERGE batched: fast_executemany wysyła cały batch jednym RPC
+            # zamiast round-tripu ~10-50 ms per wiersz
+            cursor.fast_executemany = True
+            # Czyszczenie wartości raz, wektorowo, zamiast pd.isna/strip per
+            # komórka w pętli iterrows (N×19 wywołań). Wszystkie kolumny SQL
+            # to NVARCHAR — .str.strip() zostawia NaN dla nie-stringów,
+            # a .where(...) zamienia NaN/None na SQL NULL.
+            sub = df.reindex(columns=_SQL_COLUMNS)
+            sub = sub.apply(lambda s: s.str.strip() if s.dtype == object else s)
+            sub = sub.astype(object).where(sub.notna(), None)
+            rows = list(sub.itertuples(index=False, name=None))
 
+            uploaded = 0
+            url_pos = _SQL_COLUMNS.index("url")
+            if rows:
                 try:
-                    cursor.execute(MERGE_SQL, *vals)
-                    uploaded += 1
-                except Exception as e:
-                    err = f"Wiersz {idx} ({row.get('url', '?')}): {e}"
-                    print(f"  [SQL] BŁĄD: {err}")
-                    result["errors"].append(err)
+                    # Bulk: 1 staging insert (fast_executemany) + 1 MERGE —
+                    # optymalizator robi join zamiast N pojedynczych sond
+                    cursor.execute(STAGE_CREATE_SQL)
+                    cursor.setinputsizes(_STAGE_INPUT_SIZES)
+                    cursor.executemany(STAGE_INSERT_SQL, rows)
+                    cursor.execute(STAGE_MERGE_SQL)
+                    cursor.execute("DROP TABLE #stg_nfj;")
+                    uploaded = len(rows)
+                except pyodbc.Error as e:
+                    # Bulk padł (np. zduplikowany url w stagingu) — powtórka
+                    # wiersz po wierszu, żeby wskazać winowajcę
+                    print(f"  [SQL] Bulk MERGE padł ({e}) — fallback wiersz po wierszu")
+                    conn.rollback()
+                    cursor.setinputsizes(None)
+                    for off, vals in enumerate(rows):
+                        try:
+                            cursor.execute(MERGE_SQL, *vals)
+                            uploaded += 1
+                        except Exception as e2:
+                            err = f"Wiersz {off} ({vals[url_pos] or '?'}): {e2}"
+                            print(f"  [SQL] BŁĄD: {err}")
+                            result["errors"].append(err)
 
             conn.commit()
             result["uploaded"] = uploaded
@@ -804,22 +1118,27 @@ def run(progress_callback=None) -> dict:
     new_postings = fetch_details(new_postings, progress_callback=progress_callback)
 
     # Stage 2b: Backfill details for active rows missing body_html
-    listing_by_ref = {}
-    for p in current_listings:
-        ref = p.get("reference") or p.get("id")
-        if ref:
-            listing_by_ref[ref] = p
-
     backfill_postings = []
     if not master.empty and "body_html" in master.columns:
         active_no_body = master[
             (master["is_active"] == True) &
             (master["body_html"].isna() | (master["body_html"] == ""))
         ]
-        for _, row in active_no_body.iterrows():
-            ref = row.get("reference")
-            if ref and ref in listing_by_ref:
-                backfill_postings.append(listing_by_ref[ref])
+        if not active_no_body.empty:
+            # Słownik ref->listing budujemy dopiero gdy jest co backfillować
+            # i tylko dla potrzebnych referencji — w stanie ustalonym (master
+            # w komplecie) cały ten blok to no-op
+            wanted = set(active_no_body["reference"].dropna())
+            listing_by_ref = {}
+            for p in current_listings:
+                ref = p.get("reference") or p.get("id")
+                if ref in wanted:
+                    listing_by_ref[ref] = p
+            backfill_postings = [
+                listing_by_ref[ref]
+                for ref in active_no_body["reference"].dropna()
+                if ref in listing_by_ref
+            ]
 
     if backfill_postings:
         print(f"\n{'─' * 55}")
@@ -827,31 +1146,46 @@ def run(progress_callback=None) -> dict:
         print(f"{'─' * 55}")
         backfill_postings = fetch_details(backfill_postings)
 
-        backfilled = 0
-        for p in backfill_postings:
-            ref = p.get("reference") or p.get("id")
-            flat = flatten_posting(p)
-            ref_mask = master["reference"] == ref
-            if ref_mask.any():
-                for col, val in flat.items():
-                    if val is not None and col in master.columns:
-                        master.loc[ref_mask, col] = val
-                backfilled += 1
+        backfill_scraped_at = datetime.now(timezone.utc).isoformat()
+        backfill_df = pd.DataFrame.from_records(
+            [flatten_posting(p, scraped_at=backfill_scraped_at)
+             for p in backfill_postings],
+            columns=_FLAT_COLS,
+        ).dropna(subset=["reference"]).set_index("reference")
+        backfill_df["published_at"] = _published_at_series(backfill_df["published_at"])
+
+        # Jedno wyrównanie po indeksie zamiast pełnego skanu maski per
+        # (wiersz, kolumna). update() pomija NaN/None w backfill_df, co
+        # odpowiada dotychczasowemu warunkowi `val is not None`.
+        master.set_index("reference", inplace=True)
+        backfilled = int(backfill_df.index.isin(master.index).sum())
+        master.update(backfill_df)
+        master.reset_index(inplace=True)
         print(f"  Backfilled: {backfilled} master rows updated with unified columns")
 
     # Flatten new postings and append to master
     if new_postings:
         new_rows = []
+        new_scraped_at = datetime.now(timezone.utc).isoformat()
         for p in new_postings:
-            row = flatten_posting(p)
+            row = flatten_posting(p, scraped_at=new_scraped_at)
             row["first_seen_at"] = run_timestamp
             row["last_seen_at"] = run_timestamp
             row["created_at"] = run_timestamp
             row["is_active"] = True
             new_rows.append(row)
 
-        new_df = pd.DataFrame(new_rows)
-        master = pd.concat([master, new_df], ignore_index=True)
+        new_df = pd.DataFrame.from_records(
+            new_rows,
+            columns=_FLAT_COLS + ["first_seen_at", "last_seen_at",
+                                  "created_at", "is_active"],
+        )
+        new_df["published_at"] = _published_at_series(new_df["published_at"])
+        if master.empty:
+            # concat z pustym masterem i tak kopiuje wszystkie kolumny
+            master = new_df
+        else:
+            master = pd.concat([master, new_df], ignore_index=True, copy=False)
 
     # Dedup master by reference — keep earliest first_seen_at per reference
     if "reference" in master.columns and len(master) > 0:
@@ -873,14 +1207,16 @@ def run(progress_callback=None) -> dict:
         "active_count": active_count,
         "total_count": len(master),
     }
-    with open(SNAPSHOT_JSON, "w", encoding="utf-8") as f:
-        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+    SNAPSHOT_JSON.write_bytes(_dumps(snapshot, indent=True))
 
-    # Build monitor result — check categories
+    # Build monitor result — check categories (jedno value_counts zamiast
+    # skanu kolumny per kategoria)
     active = master[master["is_active"] == True] if "is_active" in master.columns else master
     result["total_offers"] = len(active)
+    cat_counts = (active["category"].value_counts().to_dict()
+                  if "category" in active.columns else {})
     for cat in all_categories:
-        if len(active[active["category"] == cat]) > 0:
+        if cat_counts.get(cat, 0) > 0:
             result["categories_ok"].append(cat)
         else:
             result["categories_empty"].append(cat)
@@ -899,7 +1235,7 @@ def run(progress_callback=None) -> dict:
     print_summary(master, len(new_postings), run_timestamp)
 
     # Cleanup checkpoint
-    Path(CHECKPOINT_FILE).unlink(missing_ok=True)
+    CHECKPOINT_JSONL.unlink(missing_ok=True)
 
     print(f"\n[DONE] Pipeline finished.\n")
     return result
@@ -939,16 +1275,17 @@ def run_sample(n: int) -> None:
         print(f"  [{i + 1}/{len(unique)}] {pid[:60]}...", end=" ")
         try:
             detail = fetch_posting_detail(pid)
-            for key in detail:
-                posting[key] = detail[key]
+            posting.update(detail)
             print("OK")
         except Exception as e:
             print(f"FAILED ({e})")
         time.sleep(random.uniform(*DETAIL_DELAY))
 
     # Flatten
-    rows = [flatten_posting(p) for p in unique]
-    df = pd.DataFrame(rows)
+    sample_scraped_at = datetime.now(timezone.utc).isoformat()
+    rows = [flatten_posting(p, scraped_at=sample_scraped_at) for p in unique]
+    df = pd.DataFrame.from_records(rows, columns=_FLAT_COLS)
+    df["published_at"] = _published_at_series(df["published_at"])
 
     # Display
     display_cols = [
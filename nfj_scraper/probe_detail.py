@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 """Quick probe: fetch 1 NFJ listing + its detail JSON to see available fields."""
-import json
 import sys
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 
 sys.stdout.reconfigure(encoding='utf-8')
 
@@ -14,25 +15,30 @@ HEADERS = {
     "Referer": "https://nofluffjobs.com/pl/praca-it",
 }
 
+# Keep-alive: listing POST i detail GET idą po tym samym połączeniu
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=20))
+
 # 1. Get one listing
 payload = {"criteriaSearch": {"category": ["data"]}, "rawSearch": "category=data", "page": 1}
-r = requests.post(
+r = SESSION.post(
     "https://nofluffjobs.com/api/search/posting",
     params={"salaryCurrency": "PLN", "salaryPeriod": "month"},
-    headers=HEADERS, json=payload, timeout=30,
+    json=payload, timeout=30,
 )
 r.raise_for_status()
-posting = r.json()["postings"][0]
+posting = orjson.loads(r.content)["postings"][0]
 pid = posting["id"]
 print(f"Listing ID: {pid}")
 print(f"Listing keys: {list(posting.keys())}")
-print(f"\nFull listing JSON:\n{json.dumps(posting, indent=2, ensure_ascii=False)[:3000]}")
+print(f"\nFull listing JSON:\n{orjson.dumps(posting, option=orjson.OPT_INDENT_2).decode()[:3000]}")
 
 # 2. Fetch detail
 print(f"\n{'='*60}\nFetching detail: /api/posting/{pid}\n{'='*60}")
-r2 = requests.get(f"https://nofluffjobs.com/api/posting/{pid}", headers=HEADERS, timeout=30)
+r2 = SESSION.get(f"https://nofluffjobs.com/api/posting/{pid}", timeout=30)
 r2.raise_for_status()
-detail = r2.json()
+detail = orjson.loads(r2.content)
 
 # Show top-level keys
 print(f"\nDetail top-level keys: {list(detail.keys())}")
@@ -47,7 +53,8 @@ for key in detail.keys():
     else:
         print(f"\n  [{key}] = {val}")
 
-# Dump full JSON to file for inspection
-with open("nfj_scraper/probe_detail_dump.json", "w", encoding="utf-8") as f:
-    json.dump(detail, f, indent=2, ensure_ascii=False)
+# Dump full JSON to file for inspection (orjson zapisuje bajty UTF-8)
+with open("nfj_scraper/probe_detail_dump.json", "wb") as f:
+    f.write(orjson.dumps(detail, option=orjson.OPT_INDENT_2))
 print("\nFull detail JSON saved to nfj_scraper/probe_detail_dump.json")
+SESSION.close()
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import orjson
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
 
@@ -14,6 +16,11 @@ headers = {
     'Referer': 'https://nofluffjobs.com/pl/data'
 }
 
+# Sesja z keep-alive zamiast gołego requests.post — jeden TCP+TLS handshake
+SESSION = requests.Session()
+SESSION.headers.update(headers)
+SESSION.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=20))
+
 payload = {
     'criteriaSearch': {'category': ['data']},
     'rawSearch': 'category=data',
@@ -24,10 +31,10 @@ print(f"URL: {url}")
 print(f"Payload: {json.dumps(payload)}")
 
 try:
-    r = requests.post(url, headers=headers, json=payload, timeout=30)
+    r = SESSION.post(url, json=payload, timeout=30)
     print(f"Status: {r.status_code}")
     if r.status_code == 200:
-        data = r.json()
+        data = orjson.loads(r.content)
         print(f"Total count: {data.get('totalCount', 0)}")
         if 'postings' in data:
             for i, p in enumerate(data['postings'][:3], 1):
@@ -40,3 +47,5 @@ try:
         print(f"Error: {r.text[:500]}")
 except Exception as e:
     print(f"Exception: {e}")
+finally:
+    SESSION.close()
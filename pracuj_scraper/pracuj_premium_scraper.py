@@ -42,6 +42,18 @@ import pyodbc
 import browser_cookie3
 from camoufox.sync_api import Camoufox
 
+try:
+    import orjson  # opcjonalny: 2-5x szybszy parse dużych blobów __NEXT_DATA__
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _loads(raw: "str | bytes") -> dict:
+    """Parsuje JSON przez orjson jeśli dostępny, inaczej stdlib json."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
 
 # --- Fix kodowania Windows ---
 if sys.platform == "win32" and getattr(sys.stdout, "encoding", "").lower() != "utf-8":
@@ -141,9 +153,13 @@ HEADLESS = os.environ.get("PRACUJ_HEADFUL", "").strip().lower() not in ("1", "tr
 
 # --- Utility ---
 
+# Prekompilowany raz na module - funkcja jest wołana dla każdego URL-a
+_OFFER_ID_RE = re.compile(r',oferta,(\d+)')
+
+
 def _extract_offer_id(url: str) -> str:
     """Wyciaga offer_id z URL-a Pracuj.pl (np. ',oferta,1004604482' -> '1004604482')."""
-    m = re.search(r',oferta,(\d+)', url)
+    m = _OFFER_ID_RE.search(url)
     return m.group(1) if m else ""
 
 
@@ -246,8 +262,14 @@ def save_known_offers(known: dict[str, str]):
     )
 
 
+# Selektor, który ostatnio zamknął banner - próbowany jako pierwszy,
+# żeby nie przeszukiwać całej listy na każdej stronie
+_COOKIE_WINNING_SEL: "str | None" = None
+
+
 def handle_cookie_consent(page) -> bool:
     """Zamyka banner RODO / cookie consent."""
+    global _COOKIE_WINNING_SEL
     selectors = [
         'button[data-test="button-submitCookie"]',
         'button[data-test="button-accept-all"]',
@@ -259,12 +281,26 @@ def handle_cookie_consent(page) -> bool:
         '[class*="cookie"] button',
         '[class*="consent"] button:first-child',
     ]
+    # Warm path: znany selektor z krótkim timeoutem - banner renderuje się
+    # natychmiast, skoro już raz go tym selektorem kliknęliśmy
+    if _COOKIE_WINNING_SEL:
+        try:
+            btn = page.locator(_COOKIE_WINNING_SEL).first
+            if btn.is_visible(timeout=500):
+                btn.click()
+                page.wait_for_timeout(1000)
+                return True
+        except Exception:
+            pass
+    # Cold path: pełna lista z oryginalnym 2s timeoutem - pierwsza strona
+    # sesji (świeżo po CF) potrafi renderować banner z opóźnieniem
     for sel in selectors:
         try:
             btn = page.locator(sel).first
             if btn.is_visible(timeout=2000):
                 btn.click()
                 page.wait_for_timeout(1000)
+                _COOKIE_WINNING_SEL = sel
                 return True
         except Exception:
             continue
@@ -273,13 +309,15 @@ def handle_cookie_consent(page) -> bool:
 
 def get_next_data(page) -> dict | None:
     """Wyciąga i parsuje __NEXT_DATA__ JSON ze strony."""
-    raw = page.evaluate(
-        '() => { const el = document.getElementById("__NEXT_DATA__"); '
-        "return el ? el.textContent : null; }"
-    )
+    # Locator zamiast page.evaluate: pomija kompilację i ewaluację JS,
+    # tekst wraca prosto przez protokół (tak samo jak w Fazie 1)
+    try:
+        raw = page.locator("script#__NEXT_DATA__").inner_text(timeout=5000)
+    except Exception:
+        return None
     if not raw:
         return None
-    return json.loads(raw)
+    return _loads(raw)
 
 
 # ===================================================================
@@ -346,20 +384,21 @@ def _collect_one_category(page, cat_name: str, cat_url: str, seen_ids: set) -> t
             print(f"    Str. {page_num}: goto BŁĄD: {e}")
             break
 
-        deadline = time.time() + CF_RESOLVE_MAX_WAIT_S
-        while time.time() < deadline:
-            if page.locator("#__NEXT_DATA__").count() > 0:
-                break
-            time.sleep(1.0)
-
-        if page.locator("#__NEXT_DATA__").count() == 0:
+        # Event-driven czekanie na rozwiązanie CF zamiast pollingu co 1s:
+        # wraca natychmiast gdy __NEXT_DATA__ pojawi się w DOM
+        try:
+            page.wait_for_selector(
+                "script#__NEXT_DATA__", state="attached",
+                timeout=CF_RESOLVE_MAX_WAIT_S * 1000,
+            )
+        except Exception:
             title = page.title()
             print(f"    Str. {page_num}: BRAK __NEXT_DATA__ (title='{title}') - przerywam")
             break
 
         try:
             nd_text = page.locator("#__NEXT_DATA__").inner_text()
-            nd = json.loads(nd_text)
+            nd = _loads(nd_text)
         except Exception as e:
             print(f"    Str. {page_num}: JSON parse error: {e}")
             break
@@ -465,6 +504,10 @@ def phase1_collect_urls(page) -> tuple[list[dict], dict[str, int]]:
 # FAZA 2: Detail pages (headed) → pełne dane z __NEXT_DATA__
 # ===================================================================
 
+# Tabela translacji: separator tysięcy "," → spacja (translate zamiast replace)
+_SPACE_TABLE = str.maketrans(",", " ")
+
+
 def format_salary(salary_obj: dict | None) -> str:
     """Formatuje obiekt salary z detail JSON."""
     if not salary_obj:
@@ -478,15 +521,22 @@ def format_salary(salary_obj: dict | None) -> str:
         return "Hidden"
     parts = []
     if s_from is not None:
-        parts.append(f"{s_from:,.0f}".replace(",", " "))
+        parts.append(format(s_from, ",.0f").translate(_SPACE_TABLE))
     if s_to is not None:
-        parts.append(f"{s_to:,.0f}".replace(",", " "))
+        parts.append(format(s_to, ",.0f").translate(_SPACE_TABLE))
     salary_str = " – ".join(parts)
     return f"{salary_str} {currency} {kind}/{unit}".strip()
 
 
-def parse_detail_page(nd: dict, category: str, url: str) -> dict:
-    """Parsuje __NEXT_DATA__ z detail page do docelowego schematu."""
+def parse_detail_page(nd: dict, category: str, url: str,
+                      offer_id: "str | None" = None) -> dict:
+    """Parsuje __NEXT_DATA__ z detail page do docelowego schematu.
+
+    offer_id: ID znane już z Fazy 1 (stub) - podane, żeby nie wyciągać
+    go regexem z URL-a drugi raz. None = policz z URL-a.
+    """
+    if offer_id is None:
+        offer_id = _extract_offer_id(url)
     queries = (
         nd.get("props", {})
         .get("pageProps", {})
@@ -515,15 +565,19 @@ def parse_detail_page(nd: dict, category: str, url: str) -> dict:
     workplaces = attrs.get("workplaces") or []
     location = workplaces[0].get("displayAddress", "") if workplaces else ""
 
-    # --- Salary per contract type ---
+    # --- Salary + Contract Types: jeden przebieg po typesOfContracts ---
+    toc = employment.get("typesOfContracts") or []
     salary_uop = "Hidden"
     salary_b2b = "Hidden"
-    for tc in employment.get("typesOfContracts") or []:
-        name = tc.get("name", "").lower()
+    contract_types = []
+    for tc in toc:
+        name = tc.get("name", "")
+        contract_types.append(name)
+        lowered = name.lower()
         salary = tc.get("salary")
-        if "pracę" in name or "praca" in name:
+        if "pracę" in lowered or "praca" in lowered:
             salary_uop = format_salary(salary)
-        elif "b2b" in name:
+        elif "b2b" in lowered:
             salary_b2b = format_salary(salary)
 
     # --- Position Level ---
@@ -532,27 +586,28 @@ def parse_detail_page(nd: dict, category: str, url: str) -> dict:
     # --- Work Mode ---
     work_modes = [wm.get("name", "") for wm in employment.get("workModes") or []]
 
-    # --- Contract Types (lista) ---
-    contract_types = [tc.get("name", "") for tc in employment.get("typesOfContracts") or []]
-
-    # --- textSections: structured flat data ---
-    text_sections = {ts["sectionType"]: ts for ts in offer.get("textSections") or []}
-
-    # Technologies Required (tagi IT)
-    tech_req_ts = text_sections.get("technologies-expected", {})
-    tech_required = tech_req_ts.get("textElements") or []
-
-    # Technologies Nice-to-have (tagi IT)
-    tech_opt_ts = text_sections.get("technologies-optional", {})
-    tech_nice = tech_opt_ts.get("textElements") or []
+    # --- textSections: jeden przebieg zbiera 4 szukane sekcje ORAZ body ---
+    wanted = {
+        "technologies-expected", "technologies-optional",
+        "requirements-expected", "requirements-optional",
+    }
+    found: dict = {}
+    body_parts: list[str] = []
+    for ts in offer.get("textSections") or []:
+        section_type = ts.get("sectionType", "")
+        if section_type in wanted:
+            found[section_type] = ts
+        plain = ts.get("plainText", "")
+        if plain:
+            body_parts.append(f"[{section_type}] {plain}")
 
-    # Requirements Expected (bullet opisy - kluczowe dla non-IT)
-    req_exp_ts = text_sections.get("requirements-expected", {})
-    req_expected_text = req_exp_ts.get("plainText", "")
+    # Technologies: tagi IT (Required / Nice-to-have)
+    tech_required = found.get("technologies-expected", {}).get("textElements") or []
+    tech_nice = found.get("technologies-optional", {}).get("textElements") or []
 
-    # Requirements Optional (bullet opisy)
-    req_opt_ts = text_sections.get("requirements-optional", {})
-    req_optional_text = req_opt_ts.get("plainText", "")
+    # Requirements: bullet opisy (kluczowe dla non-IT)
+    req_expected_text = found.get("requirements-expected", {}).get("plainText", "")
+    req_optional_text = found.get("requirements-optional", {}).get("plainText", "")
 
     # --- Skills_Required: tagi + opis ---
     # Dla IT: technologies-expected tagi.
@@ -568,13 +623,7 @@ def parse_detail_page(nd: dict, category: str, url: str) -> dict:
     else:
         skills_nice = req_optional_text
 
-    # --- Body HTML: wszystkie sekcje tekstowe ---
-    body_parts = []
-    for ts in offer.get("textSections") or []:
-        section_type = ts.get("sectionType", "")
-        plain = ts.get("plainText", "")
-        if plain:
-            body_parts.append(f"[{section_type}] {plain}")
+    # --- Body HTML: wszystkie sekcje tekstowe (zebrane w pętli wyżej) ---
     body_html = "\n---\n".join(body_parts)
 
     # --- Published At ---
@@ -586,7 +635,7 @@ def parse_detail_page(nd: dict, category: str, url: str) -> dict:
     pracuj_category = leading_cat.get("name", "")
 
     return {
-        "Offer_ID": _extract_offer_id(url),
+        "Offer_ID": offer_id,
         "Category": category,
         "Job_Title": job_title,
         "Company": company,
@@ -633,12 +682,15 @@ def phase2_deep_dive(page, stubs: list[dict], progress_callback=None) -> list[di
         try:
             page.goto(url, wait_until="domcontentloaded", timeout=60000)
 
-            # Polling __NEXT_DATA__ — z reused cf_clearance powinno być ~1-2s
-            deadline = time.time() + CF_RESOLVE_MAX_WAIT_S
-            while time.time() < deadline:
-                if page.locator("#__NEXT_DATA__").count() > 0:
-                    break
-                time.sleep(0.5)
+            # Event-driven czekanie na __NEXT_DATA__ — z reused cf_clearance
+            # wraca po ~1-2s; timeout zostawia fallback na dane z listingu
+            try:
+                page.wait_for_selector(
+                    "script#__NEXT_DATA__", state="attached",
+                    timeout=CF_RESOLVE_MAX_WAIT_S * 1000,
+                )
+            except Exception:
+                pass
 
             handle_cookie_consent(page)
 
@@ -662,7 +714,10 @@ def phase2_deep_dive(page, stubs: list[dict], progress_callback=None) -> list[di
                     break
                 continue
 
-            row = parse_detail_page(nd, cat, url)
+            # Stub nosi offer_id z Fazy 1; fallbackiem stuba bywa cały URL
+            # (regex nie złapał) - wtedy przekaż "", jak dawne zachowanie
+            oid = stub.get("offer_id")
+            row = parse_detail_page(nd, cat, url, oid if oid != url else "")
             all_rows.append(row)
             consecutive_fails = 0
 
@@ -844,27 +899,39 @@ def upload_to_azure_sql(df: pd.DataFrame) -> dict:
             conn.commit()
             print("  [SQL] Tabela pracuj_offers - OK")
 
-            # MERGE row-by-row
+            # Przygotuj wiersze parametrów wektorowo: jeden przebieg w C
+            # po kolumnie zamiast pd.isna/strip per komórka
+            sub = df.reindex(columns=_SQL_COLUMNS)
+            sub = sub.apply(lambda s: s.str.strip() if s.dtype == object else s)
+            sub = sub.astype(object).where(sub.notna(), None)
+            rows = list(sub.itertuples(index=False, name=None))
+
+            # Batched MERGE: fast_executemany pakuje parametry w ramki TDS
+            # zamiast N osobnych roundtripów do Azure SQL
+            cursor.fast_executemany = True
+            url_pos = _SQL_COLUMNS.index("Url")
             uploaded = 0
-            for idx, row in df.iterrows():
-                vals = []
-                for col in _SQL_COLUMNS:
-                    v = row.get(col, "")
-                    if pd.isna(v):
-                        v = None
-                    elif isinstance(v, str):
-                        v = v.strip()
-                    vals.append(v)
-
+            BATCH = 1000
+            for start in range(0, len(rows), BATCH):
+                batch = rows[start:start + BATCH]
                 try:
-                    cursor.execute(MERGE_SQL, *vals)
-                    uploaded += 1
-                except Exception as e:
-                    err = f"Wiersz {idx} ({row.get('Url', '?')}): {e}"
-                    print(f"  [SQL] BŁĄD: {err}")
-                    result["errors"].append(err)
-
-            conn.commit()
+                    cursor.executemany(MERGE_SQL, batch)
+                    # Commit per batch: rollback fallbacku nie może cofnąć
+                    # wcześniejszych, udanych batchy
+                    conn.commit()
+                    uploaded += len(batch)
+                except Exception:
+                    # Batch padł - powtórz wiersz po wierszu, żeby wskazać winowajcę
+                    conn.rollback()
+                    for vals in batch:
+                        try:
+                            cursor.execute(MERGE_SQL, *vals)
+                            uploaded += 1
+                        except Exception as e:
+                            err = f"Wiersz ({vals[url_pos] or '?'}): {e}"
+                            print(f"  [SQL] BŁĄD: {err}")
+                            result["errors"].append(err)
+                    conn.commit()
             result["uploaded"] = uploaded
             print(f"  [SQL] Upload zakończony: {uploaded}/{len(df)} ofert")
 
@@ -1072,7 +1139,7 @@ def run(progress_callback=None, full_mode: bool = False) -> dict:
                 df[col] = ""
 
         output_path = get_output_path()
-        df.to_csv(output_path, index=False, encoding="utf-8-sig")
+        df.to_csv(output_path, index=False, encoding="utf-8-sig", chunksize=10000)
         result["output_path"] = output_path
 
         # --- Upload do Azure SQL ---